@@ -0,0 +1,108 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from task_manager import TaskManager, Task
+
+
+class AsyncTaskManager:
+    """Асинхронный интерфейс к TaskManager для сервисов на asyncio.
+
+    Чтения выполняются параллельно в пуле потоков (у каждого потока своё соединение, WAL не блокирует читателей).
+    Записи ставятся в очередь и выполняются единственным потоком-писателем: все накопившиеся в очереди операции
+    применяются в одной транзакции с одним коммитом.
+    """
+    logger = getLogger(__name__)
+
+    def __init__(self, db_name='tasks.db', readers=4, max_batch=100, **options):
+        self.manager = TaskManager(db_name, **options)
+        self.max_batch = max_batch  # Сколько операций записи объединять в одну транзакцию
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='task-reader')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-writer')
+        self._queue = None  # Очередь записей и задача-писатель создаются в работающем цикле событий
+        self._writer_task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def get_task(self, task_id: int | list[int] | None = None) -> Task | list[Task] | None:
+        return await self._read(self.manager.get_task, task_id)
+
+    async def search_tasks(self, keyword=None, category=None, status=None, **filters) -> list[int]:
+        return await self._read(self.manager.search_tasks, keyword, category, status, **filters)
+
+    async def add_task(self, task: Task) -> int:
+        return await self._write(self.manager.add_task, task)
+
+    async def update_task(self, task_id: int, **kwargs) -> Task | str:
+        return await self._write(self.manager.update_task, task_id, **kwargs)
+
+    async def delete_task(self, task_id: int) -> int | None:
+        return await self._write(self.manager.delete_task, task_id)
+
+    async def cleanup_database(self) -> None:
+        return await self._write(self.manager.cleanup_database)
+
+    async def close(self) -> None:
+        """Дожидается записи всех поставленных в очередь операций и закрывает потоки и соединения."""
+        if self._queue is not None:
+            await self._queue.join()
+            self._writer_task.cancel()
+            self._queue = self._writer_task = None
+        self._readers.shutdown()
+        self._writer.shutdown()
+        self.manager.close()
+
+    async def _read(self, func, *args, **kwargs):
+        """Выполняет чтение в пуле потоков-читателей."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args, **kwargs))
+
+    async def _write(self, func, *args, **kwargs):
+        """Ставит запись в очередь писателя и ждет ее результата."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._write_loop())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((functools.partial(func, *args, **kwargs), future))
+        return await future
+
+    async def _write_loop(self) -> None:
+        """Забирает из очереди все накопившиеся записи (до max_batch) и применяет их одной транзакцией."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._writer, self._apply, [op for op, _ in batch])
+            except Exception as error:
+                results = [(False, error)] * len(batch)
+            for (_, future), (ok, value) in zip(batch, results):
+                if not future.done():
+                    future.set_result(value) if ok else future.set_exception(value)
+                self._queue.task_done()
+
+    def _apply(self, operations: list) -> list[tuple[bool, object]]:
+        """Выполняется в потоке-писателе. При ошибке группа откатывается и операции повторяются по одной,
+        чтобы ошибку получила только сбойная операция."""
+        try:
+            with self.manager.transaction():
+                return [(True, operation()) for operation in operations]
+        except Exception as error:
+            if len(operations) == 1:
+                return [(False, error)]
+            self.logger.warning("Групповая запись из %s операций откатена, повтор по одной: %s",
+                                len(operations), error)
+        results = []
+        for operation in operations:
+            try:
+                with self.manager.transaction():
+                    results.append((True, operation()))
+            except Exception as error:
+                results.append((False, error))
+        return results
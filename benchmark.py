@@ -0,0 +1,177 @@
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from pathlib import Path
+
+from log_dir.setup_logging import setup_logging, set_log_level
+from task_manager import TaskManager, Task
+
+# Та же задача без __slots__ - для сравнения с Task
+DictTask = make_dataclass('DictTask', [(field_info.name, field_info.type) for field_info in fields(Task)])
+
+WORDS = ("отчет", "встреча", "проект", "покупки", "ремонт", "звонок", "письмо", "бюджет", "план", "обучение")
+CATEGORIES = ("Работа", "Дом", "Личные дела", "Здоровье", "Образование", "Отдых", "Семья", "Карьера")
+PRIORITIES = ("Низкий", "Средний", "Высокий")
+STATUSES = ("Не выполнена", "Выполнена")
+OPERATIONS = ('add_task', 'get_task', 'get_task_list', 'update_task', 'search_keyword', 'search_category',
+              'search_status', 'delete_task')
+
+
+def task_memory(count: int = 100_000, task_class=Task) -> dict:
+    """Измеряет память на объекты задач, созданные из строк базы (строки и их значения в замер не входят)."""
+    rows = [(i, f"Задача {i}", "Описание", "Работа", "01.01.2025", "Средний", "Не выполнена") for i in range(count)]
+    tracemalloc.start()
+    tasks = [task_class(*row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return {
+        'class': task_class.__name__,
+        'count': count,
+        'bytes_per_task': round(size / count, 1),
+        'mb_per_million': round(size / count * 1_000_000 / 2 ** 20, 1),
+    }
+
+
+def synthetic_task(rng: random.Random) -> Task:
+    """Случайная задача из фиксированного словаря, чтобы поиск находил реалистичное число совпадений."""
+    words = rng.sample(WORDS, 3)
+    return Task(0, f"{words[0].capitalize()} {words[1]}", f"Подготовить {' и '.join(words)}", rng.choice(CATEGORIES),
+                f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.{rng.randint(2023, 2026)}", rng.choice(PRIORITIES),
+                rng.choice(STATUSES))
+
+
+def latency_stats(timings: list[float]) -> dict:
+    """Пропускная способность и задержки (мс) по замерам отдельных вызовов в секундах."""
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        'count': len(timings),
+        'ops_per_sec': round(len(timings) / total, 1) if total else None,
+        'mean_ms': round(statistics.fmean(timings) * 1000, 4),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 4),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 4),
+    }
+
+
+def measure(operation, arguments) -> list[float]:
+    """Вызывает операцию для каждого набора аргументов и возвращает время каждого вызова."""
+    timings = []
+    for args in arguments:
+        start = time.perf_counter()
+        operation(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_size(size: int, ops: int, seed: int) -> dict:
+    """Заполняет временную базу size задачами и замеряет операции TaskManager по ops вызовов."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory, \
+            TaskManager(str(Path(directory) / "bench.db"), verbose=False) as manager:
+        start = time.perf_counter()
+        manager.bulk_add(synthetic_task(rng) for _ in range(size))
+        seed_seconds = time.perf_counter() - start
+        ids = list(range(1, size + 1))
+        timings = {
+            'add_task': measure(manager.add_task, [(synthetic_task(rng),) for _ in range(ops)]),
+            'get_task': measure(manager.get_task, [(rng.choice(ids),) for _ in range(ops)]),
+            'get_task_list': measure(manager.get_task, [(rng.sample(ids, min(100, size)),) for _ in range(ops)]),
+            'update_task': measure(lambda task_id, title: manager.update_task(task_id, title=title),
+                                   [(rng.choice(ids), rng.choice(WORDS)) for _ in range(ops)]),
+            'search_keyword': measure(manager.search_tasks, [(rng.choice(WORDS),) for _ in range(ops)]),
+            'search_category': measure(lambda category: manager.search_tasks(category=category),
+                                       [(rng.choice(CATEGORIES),) for _ in range(ops)]),
+            'search_status': measure(lambda status: manager.search_tasks(status=status),
+                                     [(rng.choice(STATUSES),) for _ in range(ops)]),
+            'delete_task': measure(manager.delete_task, [(task_id,) for task_id in rng.sample(ids, min(ops, size))]),
+        }
+    result = {name: latency_stats(timings[name]) for name in OPERATIONS}
+    result['seed'] = {'count': size, 'seconds': round(seed_seconds, 3),
+                      'tasks_per_sec': round(size / seed_seconds, 1) if seed_seconds else None}
+    return result
+
+
+def run_benchmarks(sizes: list[int], ops: int = 200, seed: int = 42) -> dict:
+    """Прогоняет бенчмарк для каждого размера базы и возвращает отчет."""
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'ops': ops,
+        'seed': seed,
+        'results': {str(size): bench_size(size, ops, seed) for size in sizes},
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2, metric: str = 'p50_ms') -> list[str]:
+    """Сравнивает отчет с базовым. Возвращает описания регрессий: метрика выросла больше чем на tolerance."""
+    regressions = []
+    for size, operations in report['results'].items():
+        for name in OPERATIONS:
+            current = operations.get(name, {}).get(metric)
+            previous = baseline.get('results', {}).get(size, {}).get(name, {}).get(metric)
+            if current is None or not previous:
+                continue
+            if current > previous * (1 + tolerance):
+                regressions.append(f"{name} на {size} задачах: {metric} {previous} -> {current} "
+                                   f"(+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    """Печатает отчет таблицей."""
+    for size, operations in report['results'].items():
+        print(f"--- {size} задач, заполнение: {operations['seed']['tasks_per_sec']} задач/с")
+        for name in OPERATIONS:
+            stats = operations[name]
+            print(f"{name:>16}: {stats['ops_per_sec']:>10} оп/с  p50 {stats['p50_ms']:>9} мс  "
+                  f"p99 {stats['p99_ms']:>9} мс")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки менеджера задач")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('run', help="замер операций TaskManager на временных базах")
+    run.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000], help="размеры баз (1k - 1M)")
+    run.add_argument('--ops', type=int, default=200, help="число вызовов каждой операции")
+    run.add_argument('--seed', type=int, default=42, help="зерно генератора для воспроизводимости")
+    run.add_argument('--report', help="сохранить отчет JSON в файл")
+    run.add_argument('--baseline', help="сравнить с ранее сохраненным отчетом")
+    run.add_argument('--tolerance', type=float, default=0.2, help="допустимый рост p50 (0.2 = 20%%)")
+    run.add_argument('--log-level', default='INFO', help="уровень логирования во время замеров")
+    memory = subparsers.add_parser('memory', help="память на объекты задач")
+    memory.add_argument('--count', type=int, default=100_000, help="количество задач для замера памяти")
+    args = parser.parse_args(argv)
+
+    if args.command == 'memory':
+        for task_class in (Task, DictTask):
+            result = task_memory(args.count, task_class)
+            print(f"{result['class']:>8}: {result['bytes_per_task']} байт на задачу, "
+                  f"{result['mb_per_million']} МБ на миллион задач")
+        return 0
+    setup_logging()
+    set_log_level(args.log_level)  # Отладочные записи на каждую операцию исказили бы замеры
+    report = run_benchmarks(args.sizes, args.ops, args.seed)
+    print_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import argparse
+import json
+import shlex
+import sqlite3
+import sys
+import time
+from logging import getLogger
+
+from commands import Commands, InputValidator, set_task_manager, get_scheduler
+from renderer import FORMATS
+from report import REPORT_FORMATS, build_report, write_report
+from sharding import ShardedTaskManager, PARTITIONS
+from task_io import read_tasks, write_tasks, task_to_record
+from task_manager import TaskManager, Task, ORDER_BY
+
+logger = getLogger(__name__)
+# Команды, работающие с одним файлом базы: у шардов свои журналы изменений, на которых строится и расписание сроков
+UNSHARDED_COMMANDS = ('changes', 'overdue', 'next', 'due', 'remind')
+
+
+def due_date_arg(value: str) -> str:
+    """Тип аргумента для даты в формате ДД.ММ.ГГГГ."""
+    if not InputValidator.is_valid_date(value):
+        raise argparse.ArgumentTypeError("Дата должна быть в формате ДД.ММ.ГГГГ")
+    return InputValidator.normalize_date(value)
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    """Фильтры и сортировка, общие для list и find."""
+    parser.add_argument('--category', help="категория")
+    parser.add_argument('--status', help="статус")
+    parser.add_argument('--priority', help="приоритет: Низкий, Средний или Высокий")
+    parser.add_argument('--due-from', type=due_date_arg, help="срок не раньше даты ДД.ММ.ГГГГ")
+    parser.add_argument('--due-to', type=due_date_arg, help="срок не позже даты ДД.ММ.ГГГГ")
+    parser.add_argument('--sort', choices=ORDER_BY, help="сортировка")
+    parser.add_argument('--limit', type=int, help="вывести не больше N задач")
+    parser.add_argument('--offset', type=int, default=0, help="пропустить первые N задач")
+    parser.add_argument('--after-id', type=int, help="страница по ключу: задачи с ID больше заданного")
+    parser.add_argument('--format', choices=FORMATS, default='text', help="формат вывода (по умолчанию text)")
+    parser.add_argument('--archive', action='store_true', help="включить задачи из архива")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Парсер неинтерактивного режима: python main.py <команда> [аргументы]."""
+    parser = argparse.ArgumentParser(prog='main.py', description="Менеджер задач в неинтерактивном режиме")
+    parser.add_argument('--db', default='tasks.db', help="файл базы данных (по умолчанию tasks.db)")
+    parser.add_argument('--shards', type=int, help="разделить базу на N файлов (tasks.0.db, tasks.1.db, ...)")
+    parser.add_argument('--partition', choices=PARTITIONS, default='id',
+                        help="разделение по шардам: по очереди (id) или по категории (по умолчанию id)")
+    parser.add_argument('--read-only', action='store_true',
+                        help="открыть базу только для чтения (для list, find и export параллельно с писателями)")
+    parser.add_argument('--metrics', help="собрать статистику запросов и сохранить снимок метрик JSON в файл")
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='команда')
+
+    add = subparsers.add_parser('add', help="добавить задачу")
+    add.add_argument('--title', required=True, help="название")
+    add.add_argument('--description', required=True, help="описание")
+    add.add_argument('--category', required=True, help="категория")
+    add.add_argument('--due-date', required=True, type=due_date_arg, help="срок ДД.ММ.ГГГГ")
+    add.add_argument('--priority', required=True, help="приоритет")
+    add.add_argument('--status', default="Не выполнена", help="статус")
+
+    add_filter_arguments(subparsers.add_parser('list', help="вывести задачи"))
+    find = subparsers.add_parser('find', help="найти задачи")
+    find.add_argument('keyword', nargs='?', help="ключевое слово")
+    add_filter_arguments(find)
+
+    done = subparsers.add_parser('done', help="отметить задачи как выполненные")
+    done.add_argument('ids', nargs='+', type=int, help="ID задач")
+
+    delete = subparsers.add_parser('del', help="удалить задачи по ID или по условиям")
+    delete.add_argument('ids', nargs='*', type=int, help="ID задач")
+    delete.add_argument('--category', help="удалить все задачи категории")
+    delete.add_argument('--status', help="удалить все задачи со статусом")
+    delete.add_argument('--before', type=due_date_arg, help="удалить задачи со сроком раньше даты ДД.ММ.ГГГГ")
+
+    import_parser = subparsers.add_parser('import', help="импортировать задачи из JSONL/CSV")
+    import_parser.add_argument('file', help="путь к файлу")
+    export_parser = subparsers.add_parser('export', help="экспортировать задачи в JSONL/CSV")
+    export_parser.add_argument('file', help="путь к файлу")
+
+    snapshot = subparsers.add_parser('snapshot', help="сохранить согласованную копию базы в файл")
+    snapshot.add_argument('file', help="путь к файлу копии")
+    restore = subparsers.add_parser('restore', help="заменить содержимое базы копией из файла")
+    restore.add_argument('file', help="путь к файлу копии")
+
+    overdue = subparsers.add_parser('overdue', help="просроченные невыполненные задачи")
+    overdue.add_argument('--format', choices=FORMATS, default='text', help="формат вывода (по умолчанию text)")
+    upcoming = subparsers.add_parser('next', help="ближайшие по сроку невыполненные задачи")
+    upcoming.add_argument('count', nargs='?', type=int, default=10, help="сколько задач вывести (по умолчанию 10)")
+    upcoming.add_argument('--format', choices=FORMATS, default='text', help="формат вывода (по умолчанию text)")
+    due = subparsers.add_parser('due', help="невыполненные задачи со сроком в периоде")
+    due.add_argument('start', type=due_date_arg, help="начало периода ДД.ММ.ГГГГ")
+    due.add_argument('end', type=due_date_arg, help="конец периода ДД.ММ.ГГГГ")
+    due.add_argument('--format', choices=FORMATS, default='text', help="формат вывода (по умолчанию text)")
+    remind = subparsers.add_parser('remind', help="печатать напоминания о наступающих сроках до Ctrl+C")
+    remind.add_argument('--interval', type=float, default=60, help="период проверки в секундах (по умолчанию 60)")
+    remind.add_argument('--days-ahead', type=int, default=0, help="напоминать за N дней до срока")
+
+    archive = subparsers.add_parser('archive', help="перенести выполненные задачи со сроком раньше даты в архив")
+    archive.add_argument('before', type=due_date_arg, help="дата ДД.ММ.ГГГГ")
+
+    summary = subparsers.add_parser('summary', help="число задач по категориям, статусам и приоритетам")
+    summary.add_argument('--format', choices=('text', 'json'), default='text', help="формат вывода")
+
+    report = subparsers.add_parser('report', help="отчет: просроченные, сроки по неделям, приоритеты по категориям")
+    report.add_argument('--format', choices=REPORT_FORMATS, default='text', help="формат вывода (по умолчанию text)")
+    report.add_argument('--output', help="сохранить отчет в файл вместо вывода на экран")
+    report.add_argument('--today', type=due_date_arg, help="дата отчета ДД.ММ.ГГГГ (по умолчанию сегодня)")
+    report.add_argument('--archive', action='store_true', help="включить задачи из архива")
+
+    changes = subparsers.add_parser('changes', help="вывести журнал изменений задач в формате JSON Lines")
+    changes.add_argument('--since', type=int, default=0, help="номер последнего уже полученного изменения")
+    changes.add_argument('--limit', type=int, help="вывести не больше N изменений")
+
+    batch = subparsers.add_parser('batch', help="выполнить команды из файла или stdin (-) в одной транзакции")
+    batch.add_argument('file', nargs='?', default='-', help="файл с командами, по одной на строку")
+    return parser
+
+
+def run_command(args: argparse.Namespace, manager: TaskManager) -> int:
+    """Выполняет одну команду. Возвращает код завершения."""
+    if isinstance(manager, ShardedTaskManager) and args.command in UNSHARDED_COMMANDS:
+        raise ValueError(f"Команда {args.command} не поддерживается для базы, разделенной на шарды (--shards)")
+    if args.command == 'add':
+        task = Task(0, args.title, args.description, args.category, args.due_date, args.priority, args.status)
+        print(manager.add_task(task))
+    elif args.command in ('list', 'find'):
+        page = {'after_id': args.after_id, 'limit': args.limit, 'offset': args.offset}
+        filters = {'keyword': getattr(args, 'keyword', None), 'category': args.category, 'status': args.status,
+                   'priority': args.priority, 'due_from': args.due_from, 'due_to': args.due_to}
+        if not any(filters.values()) and args.sort in (None, 'id'):  # Все задачи - потоком из курсора
+            Commands.print_tasks(None, args.format, include_archive=args.archive, **page)
+        else:
+            task_ids = manager.search_tasks(**filters, order_by=args.sort, include_archive=args.archive, **page)
+            Commands.print_tasks(task_ids, args.format, include_archive=args.archive)
+    elif args.command == 'done':
+        results = [manager.update_task(task_id, status="Выполнена") for task_id in args.ids]
+        missing = [task_id for task_id, task in zip(args.ids, results) if not isinstance(task, Task)]
+        if missing:
+            print(f"Задачи не найдены: {', '.join(map(str, missing))}", file=sys.stderr)
+            return 1
+    elif args.command == 'del':
+        if args.ids and (args.category or args.status or args.before):
+            print("Укажите либо ID задач, либо условия удаления", file=sys.stderr)
+            return 2
+        if args.ids:
+            deleted = sum(manager.delete_task(task_id) is not None for task_id in args.ids)
+        else:
+            deleted = manager.delete_where(category=args.category, status=args.status, before_date=args.before)
+        print(deleted)
+    elif args.command == 'import':
+        print(manager.bulk_add(read_tasks(args.file)))
+    elif args.command == 'export':
+        print(write_tasks(manager.iter_tasks(), args.file))
+    elif args.command == 'snapshot':
+        manager.snapshot(args.file)
+    elif args.command == 'restore':
+        manager.restore(args.file)
+    elif args.command in ('overdue', 'next', 'due'):
+        scheduler = get_scheduler()
+        task_ids = {'overdue': lambda: scheduler.overdue(), 'next': lambda: scheduler.upcoming(args.count),
+                    'due': lambda: scheduler.due_between(args.start, args.end)}[args.command]()
+        Commands.print_tasks(task_ids, args.format)
+    elif args.command == 'remind':
+        scheduler = get_scheduler()
+        scheduler.start_reminders(lambda task: print(f"Срок {task.due_date}: [{task.task_id}] {task.title}",
+                                                     flush=True), args.interval, args.days_ahead)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop_reminders()
+    elif args.command == 'archive':
+        print(manager.archive(args.before))
+    elif args.command == 'summary':
+        summary = manager.summary()
+        print(json.dumps(summary, ensure_ascii=False) if args.format == 'json' else Commands.format_summary(summary))
+    elif args.command == 'report':
+        report = build_report(manager, args.today, args.archive)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                write_report(report, args.format, f)
+        else:
+            write_report(report, args.format, sys.stdout)
+    elif args.command == 'changes':
+        for change in manager.changes_since(args.since, limit=args.limit):
+            record = {'seq': change.seq, 'operation': change.operation, 'task_id': change.task_id,
+                      'changed_at': change.changed_at, 'task': change.task and task_to_record(change.task)}
+            print(json.dumps(record, ensure_ascii=False))
+    return 0
+
+
+def run_batch(lines, parser: argparse.ArgumentParser, manager: TaskManager) -> int:
+    """Выполняет команды построчно в одной транзакции. При ошибке все изменения откатываются."""
+    status = 0
+    with manager.transaction():
+        for number, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith('#'):  # Пустые строки и комментарии
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+            except SystemExit:  # argparse уже напечатал сообщение об ошибке
+                raise ValueError(f"Строка {number}: некорректная команда")
+            if args.command == 'batch':
+                raise ValueError(f"Строка {number}: вложенный batch не поддерживается")
+            if args.command in ('snapshot', 'restore'):  # Снимок и восстановление невозможны внутри транзакции
+                raise ValueError(f"Строка {number}: {args.command} не поддерживается внутри batch")
+            status = max(status, run_command(args, manager))
+    return status
+
+
+def run(argv: list[str]) -> int:
+    """Точка входа неинтерактивного режима: одна сессия базы данных на весь вызов."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    options = {'task_cache_size': 1024, 'verbose': False, 'stats': bool(args.metrics), 'read_only': args.read_only}
+    if args.shards:
+        manager = ShardedTaskManager(args.db, args.shards, args.partition, **options)
+    else:
+        manager = TaskManager(args.db, **options)
+    with manager:
+        set_task_manager(manager)
+        try:
+            if args.command == 'batch':
+                if args.file == '-':
+                    return run_batch(sys.stdin, parser, manager)
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    return run_batch(f, parser, manager)
+            return run_command(args, manager)
+        except (ValueError, OSError, sqlite3.Error) as error:
+            logger.error("Ошибка неинтерактивной команды %s: %s", args.command, error)
+            print(f"Ошибка: {error}", file=sys.stderr)
+            return 1
+        finally:
+            if args.metrics:  # Снимок после выполнения команды, включая ее коммит
+                manager.flush()
+                with open(args.metrics, 'w', encoding='utf-8') as f:
+                    json.dump(manager.metrics(), f, ensure_ascii=False, indent=2)
@@ -1,12 +1,47 @@
+import json
+import os
 from datetime import datetime
 from dataclasses import fields
 import sys
 from logging import getLogger
 
-from task_manager import TaskManager, Task, tasks
+from task_manager import TaskManager, Task, tasks, PRIORITY_RANKS
+from task_io import read_tasks, write_tasks, FORMATS
+from renderer import TaskRenderer
+from scheduler import DeadlineScheduler
+from report import build_report, format_report, write_report
 
 logger = getLogger(__name__)
-task_manager = TaskManager()
+STATS_VARIABLE = 'TASK_MANAGER_STATS'  # Непустое значение включает статистику запросов интерактивного режима
+_task_manager = None
+_scheduler = None
+
+
+def get_task_manager() -> TaskManager:
+    """Общий для команд экземпляр TaskManager. Создается при первом обращении, а не при импорте модуля."""
+    global _task_manager
+    if _task_manager is None:
+        _task_manager = TaskManager(task_cache_size=1024, search_cache_size=256,
+                                    stats=bool(os.environ.get(STATS_VARIABLE)))
+    return _task_manager
+
+
+def set_task_manager(manager: TaskManager) -> None:
+    """Подменяет общий экземпляр TaskManager, например открытый неинтерактивным режимом с другой базой."""
+    global _task_manager, _scheduler
+    _task_manager = manager
+    _scheduler = None
+
+
+def get_scheduler(live: bool = False) -> DeadlineScheduler:
+    """Расписание сроков для общего TaskManager. Без live запросы выполняются по индексу сроков (разовые команды),
+    с live=True расписание строится в памяти и далее обновляется по журналу (интерактивный режим)."""
+    global _scheduler
+    if _scheduler is None or _scheduler.manager is not get_task_manager():
+        _scheduler = DeadlineScheduler(get_task_manager())
+    if live:
+        _scheduler.refresh()  # Первый вызов строит расписание, следующие применяют новые изменения
+    return _scheduler
 
 
 class InputValidator:
@@ -35,6 +70,11 @@ class InputValidator:
         except ValueError:
             return False
 
+    @staticmethod
+    def normalize_date(date_str) -> str:
+        """Приводит дату к виду ДД.ММ.ГГГГ с ведущими нулями, чтобы срок задачи попадал в индекс сроков."""
+        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%d.%m.%Y')
+
     @staticmethod
     def del_or_not(choice: bool) -> None:
         if choice:
@@ -53,20 +93,33 @@ class Commands:
 
     @staticmethod
     def making_a_choice(delete=False) -> int | None:
-        prompt = ("Выберите 1 чтобы вывести все задачи, 2 чтобы выбрать категорию: ",
-                  "Выберите 1 чтобы удалить одну задачу по ID и 2, чтобы удалить категорию задач: ")[delete]
+        prompt = ("Выберите 1 чтобы вывести все задачи, 2 чтобы выбрать категорию, "
+                  "3 чтобы отфильтровать по сроку и приоритету: ",
+                  "Выберите 1 чтобы удалить одну задачу по ID, 2 чтобы удалить категорию задач, "
+                  "3 чтобы удалить задачи по статусу или сроку: ")[delete]
         choice = InputValidator.safe_input(
             prompt,
-            validation_func=lambda x: x.isdigit() and int(x) in (1, 2),
-            error_message="Выбор должен быть цифрой 1 или 2")
+            validation_func=lambda x: x.isdigit() and int(x) in (1, 2, 3),
+            error_message="Выбор должен быть цифрой от 1 до 3")
         if choice is None:
             return
         choice = int(choice)
+        if choice == 3:
+            filters = (Commands.input_filters, Commands.input_delete_filters)[delete]()
+            if filters is None:
+                return
+            if delete:
+                if InputValidator.del_or_not(delete):
+                    print(f"Удалено задач: {get_task_manager().delete_where(**filters)}")
+                return
+            task_ids = get_task_manager().search_tasks(**filters)
+            Commands.print_tasks(task_ids) if task_ids else print("По заданным параметрам задач не найдено.")
+            return
         if choice == 2:
-            categories = task_manager.execute_query("SELECT DISTINCT category FROM tasks", one_line=False)
-            categories_dict = {i: category[0] for i, category in enumerate(categories, start=1)}
+            counts = get_task_manager().summary()['category']  # Сводная таблица, без просмотра всех задач
+            categories_dict = {i: category for i, category in enumerate(counts, start=1)}
             for index, category in categories_dict.items():
-                print(f"Категория: '{category}' нажмите {index} ")
+                print(f"Категория: '{category}' ({counts[category]}) нажмите {index} ")
             categories_id = categories_dict.keys()
             tmp = True
             while tmp:
@@ -77,24 +130,37 @@ class Commands:
                 )
                 if category_id is None:
                     return
-                categories_id = task_manager.search_tasks(categories_dict[int(category_id)])
+                category = categories_dict[int(category_id)]
                 break
-            choice_call = (
-                lambda: Commands.print_tasks(categories_id),
-                lambda: [task_manager.delete_task(e) for e in categories_id]
-            )[delete]
-            if InputValidator.del_or_not(delete):
-                choice_call()
+            if delete:  # Вся категория удаляется одним запросом
+                if InputValidator.del_or_not(delete):
+                    print(f"Удалено задач: {get_task_manager().delete_where(category=category)}")
                 return
-            choice_call()
+            Commands.print_tasks(get_task_manager().search_tasks(category=category))
         if choice == 1:
             choice_call = (Commands.print_tasks, Commands.delete_task)[delete]
-            if InputValidator.del_or_not(delete):
+            if not delete or InputValidator.del_or_not(delete):  # При отказе от удаления ничего не делаем
                 choice_call()
-                return
-            choice_call()
             return
 
+    @staticmethod
+    def input_delete_filters() -> dict | None:
+        """Запрашивает статус и дату, раньше которой удаляются задачи. Хотя бы одно условие обязательно."""
+        while True:
+            status = InputValidator.safe_input("Введите статус удаляемых задач: ", allow_empty=True)
+            if status is None:
+                return None
+            before_date = InputValidator.safe_input(
+                "Удалить задачи со сроком раньше даты (ДД.ММ.ГГГГ): ",
+                validation_func=lambda x: not x or InputValidator.is_valid_date(x),
+                error_message="Дата должна быть в формате ДД.ММ.ГГГГ!",
+                allow_empty=True)
+            if before_date is None:
+                return None
+            if status or before_date:
+                return {'status': status or None, 'before_date': before_date or None}
+            print("Нужно задать статус или дату.")
+
     @staticmethod
     def create_task_from_input() -> Task:
         """Создает новую задачу из ввода пользователя."""
@@ -113,39 +179,34 @@ class Commands:
                         f'Заполните поле "{field_info.metadata["title"]}": ', allow_empty=False)
                 if user_input is None:  # Пользователь выбрал выход
                     return None
+                if field_info.name == 'due_date':
+                    user_input = InputValidator.normalize_date(user_input)
                 task_data[field_info.name] = user_input
         task = Task(task_id=0, **task_data)
         print("-" * 60, "Создана новая задача!", "-" * 60, sep="\n")
-        task_id = task_manager.add_task(task)
+        task_id = get_task_manager().add_task(task)
         Commands.print_tasks(task_id)
 
     @staticmethod
-    def print_tasks(task_id: int | list | None = None) -> int:
-        """Выводит информацию о задачах вместе с полями из метаданных. Возвращает количество задач."""
-        tasks = task_manager.get_task(task_id) if task_id else task_manager.get_task()
-        row = 9
-        row2 = 15
-        number_of_taks = len(tasks) if isinstance(tasks, list) else 1
-        if isinstance(tasks, Task):
-            tasks = [tasks]
-        for task in tasks:
-            field_iter = iter(fields(Task))
-            for field_info in field_iter:
-                field_title = field_info.metadata.get("title", field_info.name)
-                field_value = getattr(task, field_info.name)
-                if len(str(field_value)) > 15:
-                    print(f"{field_title:>{row}}: {field_value}")
-                    continue
-                next_field_info = next(field_iter, None)
-                if next_field_info:
-                    next_field_title = next_field_info.metadata.get("title", next_field_info.name)
-                    next_field_value = getattr(task, next_field_info.name)
-                    print(f"{field_title:>{row}}: {field_value:<{row2}}"
-                          f"{next_field_title:>{row}}: {next_field_value:<{row2}}")
-                else:
-                    print(f"{field_title:>{row}}: {field_value:<{row2}}")
-            print("-" * 60)
-        print(f"Всего задач: {number_of_taks}") if number_of_taks != 1 else None
+    def print_tasks(task_id: int | list | None = None, fmt: str = 'text', out=None, include_archive=False,
+                    **page) -> int:
+        """Выводит информацию о задачах вместе с полями из метаданных. Возвращает количество задач.
+
+        Все задачи читаются из курсора потоково, page (after_id, limit, offset) задает страницу.
+        fmt - формат вывода: 'text', 'tsv' или 'jsonl'. include_archive - выводить также задачи из архива.
+        """
+        manager = get_task_manager()
+        if task_id is None:
+            tasks = manager.iter_tasks(include_archive=include_archive, **page)
+        elif isinstance(task_id, list):
+            tasks = manager.iter_tasks(task_id, include_archive=include_archive)
+        else:
+            task = manager.get_task(task_id, include_archive)
+            tasks = [task] if task else []
+        renderer = TaskRenderer(fmt, out)
+        number_of_taks = renderer.render(tasks)
+        if fmt == 'text' and number_of_taks != 1:
+            renderer.out.write(f"Всего задач: {number_of_taks}\n")
         return number_of_taks
 
     @staticmethod
@@ -166,7 +227,7 @@ class Commands:
             print("Операция редактирования отменена.")
             return
         task_id = int(task_id_input)
-        task = task_manager.get_task(task_id)
+        task = get_task_manager().get_task(task_id)
         if not task:
             return
         updates = {}
@@ -186,15 +247,20 @@ class Commands:
                 return
             choice = int(choice)
             field_info = fields_dict[choice]
+            is_date = field_info.name == 'due_date'
             new_value = InputValidator.safe_input(
                 f'Введите новое значение для поля "{field_info.metadata.get("title", field_info.name)}": ',
+                validation_func=InputValidator.is_valid_date if is_date else None,
+                error_message="Дата должна быть в формате ДД.ММ.ГГГГ!",
                 allow_empty=False
             )
             if new_value is None:
                 return
+            if is_date:
+                new_value = InputValidator.normalize_date(new_value)
             updates[field_info.name] = new_value
             if updates:
-                task_manager.update_task(task_id, **updates)
+                get_task_manager().update_task(task_id, **updates)
                 print("-" * 60, "Задача обновлена!", "-" * 60, sep="\n")
             else:
                 print("-" * 60, "Изменений не внесено!", "-" * 60, sep="\n")
@@ -213,11 +279,11 @@ class Commands:
             print("Операция выполнения задачи отменена.")
             return
         task_id = int(task_id_input)
-        task = task_manager.get_task(task_id)
+        task = get_task_manager().get_task(task_id)
         if not task:
             print(f"Задача с ID {task_id} не найдена.")
             return
-        task_manager.update_task(task_id, status="Выполнена")
+        get_task_manager().update_task(task_id, status="Выполнена")
         print("-" * 60, "Задача выполнена!", "-" * 60, sep="\n")
         Commands.print_tasks(task_id)
 
@@ -234,14 +300,46 @@ class Commands:
             print("Операция удаления отменена.")
             return
         task_id = int(task_id_input)
-        if task_manager.delete_task(task_id):
+        if get_task_manager().delete_task(task_id):
             return
         else:
             print(f"Не удалось найти задачу с ID {task_id}. Удаление не выполнено.")
 
+    @staticmethod
+    def input_filters() -> dict | None:
+        """Запрашивает диапазон сроков, приоритет и порядок сортировки. Пустой ввод пропускает параметр."""
+        filters = {}
+        for name, prompt in (('due_from', "Введите начало периода сроков (ДД.ММ.ГГГГ): "),
+                             ('due_to', "Введите конец периода сроков (ДД.ММ.ГГГГ): ")):
+            value = InputValidator.safe_input(
+                prompt,
+                validation_func=lambda x: not x or InputValidator.is_valid_date(x),
+                error_message="Дата должна быть в формате ДД.ММ.ГГГГ!",
+                allow_empty=True)
+            if value is None:
+                return None
+            filters[name] = value or None
+        priority = InputValidator.safe_input(
+            "Введите приоритет (Низкий, Средний, Высокий): ",
+            validation_func=lambda x: not x or x.lower() in PRIORITY_RANKS,
+            error_message="Приоритет должен быть: Низкий, Средний или Высокий",
+            allow_empty=True)
+        if priority is None:
+            return None
+        filters['priority'] = priority or None
+        order = InputValidator.safe_input(
+            "Сортировка: 1 - по ID, 2 - по сроку, 3 - по приоритету (пусто - по умолчанию): ",
+            validation_func=lambda x: not x or x in ('1', '2', '3'),
+            error_message="Выбор должен быть цифрой от 1 до 3",
+            allow_empty=True)
+        if order is None:
+            return None
+        filters['order_by'] = {'1': 'id', '2': 'due_date', '3': 'priority'}.get(order)
+        return filters
+
     @staticmethod
     def input_search_task() -> int | list[int] | None:
-        """Предлагает пользователю ввести ключевое слово, категорию и статус для поиска задач."""
+        """Предлагает пользователю ввести ключевое слово, категорию, статус, сроки и приоритет для поиска задач."""
         print("Введите ключевые параметры для поиска. Оставьте поле пустым для пропуска.")
         keyword = InputValidator.safe_input("Введите ключевое слово для поиска: ", allow_empty=True)
         if keyword is None:
@@ -252,10 +350,14 @@ class Commands:
         status = InputValidator.safe_input("Введите статус для поиска: ", allow_empty=True)
         if status is None:
             return None
-        if not keyword and not category and not status:
+        filters = Commands.input_filters()
+        if filters is None:
+            return None
+        if not keyword and not category and not status and not any(
+                filters[name] for name in ('due_from', 'due_to', 'priority')):
             print("Вы не ввели ни одного параметра для поиска.")
             return None
-        return task_manager.search_tasks(keyword, category, status)
+        return get_task_manager().search_tasks(keyword, category, status, **filters)
 
     @staticmethod
     def search_task() -> None | list[int] | int:
@@ -279,12 +381,139 @@ class Commands:
 
     @staticmethod
     def clear():
-        task_manager.cleanup_database()
+        get_task_manager().cleanup_database()
         print("База данных очищена.")
 
+    @staticmethod
+    def import_tasks() -> int | None:
+        """Импортирует задачи из файла JSONL или CSV пакетами. Возвращает количество добавленных задач."""
+        file_path = InputValidator.safe_input(
+            f"Введите путь к файлу ({', '.join(FORMATS)}): ",
+            validation_func=lambda x: x.lower().endswith(FORMATS),
+            error_message=f"Файл должен иметь расширение {', '.join(FORMATS)}")
+        if file_path is None:
+            print("Операция импорта отменена.")
+            return None
+        added = get_task_manager().bulk_add(read_tasks(file_path),
+                                            progress=lambda count: print(f"\rИмпортировано задач: {count}", end=""))
+        print(f"\rИмпортировано задач: {added}")
+        return added
+
+    @staticmethod
+    def export_tasks() -> int | None:
+        """Экспортирует все задачи в файл JSONL или CSV. Возвращает количество записанных задач."""
+        file_path = InputValidator.safe_input(
+            f"Введите путь к файлу ({', '.join(FORMATS)}): ",
+            validation_func=lambda x: x.lower().endswith(FORMATS),
+            error_message=f"Файл должен иметь расширение {', '.join(FORMATS)}")
+        if file_path is None:
+            print("Операция экспорта отменена.")
+            return None
+        written = write_tasks(get_task_manager().iter_tasks(), file_path)
+        print(f"Экспортировано задач: {written}")
+        return written
+
+    @staticmethod
+    def show_overdue() -> list[int]:
+        """Выводит просроченные невыполненные задачи, сначала самые давние."""
+        task_ids = get_scheduler(live=True).overdue()
+        Commands.print_tasks(task_ids) if task_ids else print("Просроченных задач нет.")
+        return task_ids
+
+    @staticmethod
+    def show_upcoming() -> list[int] | None:
+        """Выводит N ближайших по сроку невыполненных задач."""
+        count = InputValidator.safe_input("Сколько ближайших задач показать (Enter - 10): ",
+                                          validation_func=lambda x: not x or x.isdigit() and int(x) > 0,
+                                          error_message="Введите положительное число.", allow_empty=True)
+        if count is None:
+            return None
+        task_ids = get_scheduler(live=True).upcoming(int(count or 10))
+        Commands.print_tasks(task_ids) if task_ids else print("Предстоящих задач нет.")
+        return task_ids
+
+    @staticmethod
+    def show_due_between() -> list[int] | None:
+        """Выводит невыполненные задачи со сроком в заданном периоде."""
+        dates = []
+        for prompt in ("Введите начало периода (ДД.ММ.ГГГГ): ", "Введите конец периода (ДД.ММ.ГГГГ): "):
+            value = InputValidator.safe_input(prompt, validation_func=InputValidator.is_valid_date,
+                                              error_message="Дата должна быть в формате ДД.ММ.ГГГГ!")
+            if value is None:
+                return None
+            dates.append(value)
+        task_ids = get_scheduler(live=True).due_between(*dates)
+        Commands.print_tasks(task_ids) if task_ids else print("В этом периоде задач нет.")
+        return task_ids
+
+    @staticmethod
+    def archive_tasks() -> int | None:
+        """Переносит выполненные задачи со сроком раньше введенной даты в архив."""
+        before = InputValidator.safe_input("Перенести в архив выполненные задачи со сроком раньше (ДД.ММ.ГГГГ): ",
+                                           validation_func=InputValidator.is_valid_date,
+                                           error_message="Дата должна быть в формате ДД.ММ.ГГГГ!")
+        if before is None:
+            print("Операция архивации отменена.")
+            return None
+        archived = get_task_manager().archive(before)
+        print(f"Перенесено в архив задач: {archived}")
+        return archived
+
+    @staticmethod
+    def show_summary() -> dict:
+        """Выводит число задач по категориям, статусам и приоритетам."""
+        summary = get_task_manager().summary()
+        print(Commands.format_summary(summary))
+        return summary
+
+    @staticmethod
+    def format_summary(summary: dict[str, dict[str, int]]) -> str:
+        """Сводка задач текстом: всего задач и число задач по каждому значению."""
+        titles = {'category': "Категории", 'status': "Статусы", 'priority': "Приоритеты"}
+        lines = [f"Всего задач: {sum(summary['status'].values())}"]
+        for dimension, title in titles.items():
+            lines.append(f"{title}:")
+            counts = sorted(summary[dimension].items(), key=lambda item: item[1], reverse=True)
+            lines.extend(f"{number:>10}  {value}" for value, number in counts)
+        return "\n".join(lines)
+
+    @staticmethod
+    def show_report() -> dict:
+        """Выводит отчет по задачам и по желанию сохраняет его в файл .json или .csv."""
+        report = build_report(get_task_manager())
+        print(format_report(report))
+        file_path = InputValidator.safe_input("Сохранить отчет в файл .json или .csv (Enter - не сохранять): ",
+                                              validation_func=lambda x: not x or x.lower().endswith(('.json', '.csv')),
+                                              error_message="Файл должен иметь расширение .json или .csv",
+                                              allow_empty=True)
+        if file_path:
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                write_report(report, 'json' if file_path.lower().endswith('.json') else 'csv', f)
+            print(f"Отчет сохранен в {file_path}")
+        return report
+
+    @staticmethod
+    def show_stats() -> dict | None:
+        """Выводит статистику запросов текущей сессии и по желанию сохраняет снимок метрик в JSON."""
+        manager = get_task_manager()
+        if manager.stats is None:
+            print(f"Статистика запросов отключена, для включения задайте переменную окружения {STATS_VARIABLE}=1.")
+            return None
+        print(manager.stats.format())
+        for name, info in (("задач", manager.cache_info()), ("поиска", manager.search_cache_info())):
+            print(f"Кэш {name}: попаданий {info.hits}, промахов {info.misses}, доля попаданий {info.hit_ratio:.1%}")
+        metrics = manager.metrics()
+        file_path = InputValidator.safe_input("Сохранить снимок метрик в файл (Enter - не сохранять): ",
+                                              allow_empty=True)
+        if file_path:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=2)
+            print(f"Снимок метрик сохранен в {file_path}")
+        return metrics
+
     @staticmethod
     def test():
-        [task_manager.add_task(task) for task in tasks]
+        get_task_manager().bulk_add(tasks)
         print("База данных заполнена тестовыми задачами. list - список всех задач.")
 
 
@@ -1,12 +1,13 @@
-from log_dir.setup_logging import *
+from log_dir.setup_logging import setup_logging
 import atexit
+import logging
+import sys
 from commands import Commands as Co
 
 logger = logging.getLogger()
 
 
-# Регистрация функции очистки при завершении программы
-@atexit.register # нужно, что бы при выходе записывался лог
+# Функция очистки при завершении программы, регистрируется в __main__ после setup_logging()
 def cleanup():
     logger.info("Завершение программы")
 
@@ -40,6 +41,15 @@ def main():
         'exit': lambda: Co.exit_program(),
         'clear': lambda: (Co.clear(), logger.info("Команда clear выполнена")),
         'test': lambda: (Co.test(), logger.info("Команда test выполнена")),
+        'import': lambda: (Co.import_tasks(), logger.info("Команда import выполнена")),
+        'export': lambda: (Co.export_tasks(), logger.info("Команда export выполнена")),
+        'stats': lambda: (Co.show_stats(), logger.info("Команда stats выполнена")),
+        'summary': lambda: (Co.show_summary(), logger.info("Команда summary выполнена")),
+        'overdue': lambda: (Co.show_overdue(), logger.info("Команда overdue выполнена")),
+        'next': lambda: (Co.show_upcoming(), logger.info("Команда next выполнена")),
+        'due': lambda: (Co.show_due_between(), logger.info("Команда due выполнена")),
+        'archive': lambda: (Co.archive_tasks(), logger.info("Команда archive выполнена")),
+        'report': lambda: (Co.show_report(), logger.info("Команда report выполнена")),
     }
 
     print('-' * 60, f"{' ' * 12}Добро пожаловать в Task Manager!", '-' * 60, Co.read_file('help_text'), sep='\n')
@@ -65,9 +75,15 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
+    # Обработчики atexit вызываются в обратном порядке: cleanup выполнится раньше остановки потока логов
+    atexit.register(cleanup)  # нужно, что бы при выходе записывался лог
+    if len(sys.argv) > 1:  # Неинтерактивный режим: python main.py <команда> [аргументы]
+        import cli
+        sys.exit(cli.run(sys.argv[1:]))
     logger.info("Запуск программы")
     try:
         main()
     except Exception as e:
-        logger.error(f'Произошла ошибка при запуске программы: {e}')
+        logger.error('Произошла ошибка при запуске программы: %s', e)
         print(f'Произошла ошибка: {e}')
@@ -0,0 +1,104 @@
+import re
+import threading
+import time
+from collections import deque
+from logging import getLogger
+
+# Верхние границы корзин гистограммы времени выполнения запроса, мс. Последняя корзина - все, что дольше.
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+SLOW_LOG_SIZE = 50  # Сколько последних медленных запросов хранить вместе с планами
+STATEMENT_WIDTH = 200  # Длина текста запроса в ключе статистики
+
+
+def statement_key(query: str) -> str:
+    """Текст запроса без лишних пробелов - ключ статистики. Параметры в ключ не входят."""
+    return re.sub(r'\s+', ' ', query).strip()[:STATEMENT_WIDTH]
+
+
+class QueryStats:
+    """Статистика запросов TaskManager: гистограммы времени и число строк по каждому запросу, открытые соединения,
+    строки, записанные триггерами (полнотекстовый индекс), и журнал медленных запросов с планами выполнения."""
+    logger = getLogger(__name__)
+
+    def __init__(self, slow_query_ms: float = 100):
+        self.slow_query_ms = slow_query_ms  # Запросы дольше порога попадают в журнал медленных с EXPLAIN QUERY PLAN
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.reset()
+
+    def reset(self) -> None:
+        """Обнуляет накопленную статистику."""
+        with self._lock:
+            self._statements = {}
+            self._slow = deque(maxlen=SLOW_LOG_SIZE)
+            self.connections_opened = 0
+            self.trigger_writes = 0  # Строки, записанные триггерами: индекс tasks_fts и его служебные таблицы
+            self._started = time.time()
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def is_slow(self, seconds: float) -> bool:
+        return seconds * 1000 >= self.slow_query_ms
+
+    def record(self, query: str, seconds: float, rows: int = 0, trigger_writes: int = 0) -> None:
+        """Учитывает одно выполнение запроса: время, число прочитанных или измененных строк."""
+        key = statement_key(query)
+        elapsed_ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(BUCKETS_MS) if elapsed_ms <= bound), len(BUCKETS_MS))
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                                                 'histogram': [0] * (len(BUCKETS_MS) + 1)}
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += max(rows, 0)
+            stats['histogram'][bucket] += 1
+            self.trigger_writes += max(trigger_writes, 0)
+
+    def record_slow(self, query: str, seconds: float, plan: list[str]) -> None:
+        """Добавляет запрос в журнал медленных и пишет его в лог вместе с планом выполнения."""
+        entry = {'query': statement_key(query), 'ms': round(seconds * 1000, 3), 'plan': plan,
+                 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self._lock:
+            self._slow.append(entry)
+        self.logger.warning("Медленный запрос (%.1f мс): %s\nПлан: %s", entry['ms'], entry['query'],
+                            "; ".join(plan) or "нет")
+
+    def snapshot(self) -> dict:
+        """Снимок метрик, пригодный для json.dumps."""
+        with self._lock:
+            statements = {
+                key: {**stats, 'total_ms': round(stats['total_ms'], 3), 'max_ms': round(stats['max_ms'], 3),
+                      'mean_ms': round(stats['total_ms'] / stats['calls'], 4), 'histogram': list(stats['histogram'])}
+                for key, stats in self._statements.items()
+            }
+            return {
+                'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._started)),
+                'buckets_ms': list(BUCKETS_MS),
+                'queries': sum(stats['calls'] for stats in statements.values()),
+                'connections_opened': self.connections_opened,
+                'trigger_writes': self.trigger_writes,
+                'slow_query_ms': self.slow_query_ms,
+                'statements': statements,
+                'slow_queries': list(self._slow),
+            }
+
+    def format(self, top: int = 10) -> str:
+        """Текстовый отчет: общие счетчики и самые долгие по суммарному времени запросы."""
+        snapshot = self.snapshot()
+        lines = [f"Запросов: {snapshot['queries']}, открыто соединений: {snapshot['connections_opened']}, "
+                 f"записей триггеров: {snapshot['trigger_writes']}, медленных: {len(snapshot['slow_queries'])}",
+                 "-" * 60]
+        ordered = sorted(snapshot['statements'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        for key, stats in ordered[:top]:
+            lines.append(f"{stats['calls']:>7} раз  {stats['total_ms']:>10.2f} мс  сред. {stats['mean_ms']:>8.3f} мс"
+                         f"  макс. {stats['max_ms']:>8.2f} мс  строк {stats['rows']:>7}")
+            lines.append(f"    {key}")
+        for entry in snapshot['slow_queries'][-top:]:
+            lines.append(f"Медленный ({entry['ms']} мс): {entry['query']}")
+            lines.extend(f"    {step}" for step in entry['plan'])
+        return "\n".join(lines)
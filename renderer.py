@@ -0,0 +1,71 @@
+import json
+import sys
+from collections.abc import Iterable
+from dataclasses import fields
+
+from task_io import task_to_record, FILE_FIELDS
+from task_manager import Task
+
+FORMATS = ('text', 'tsv', 'jsonl')
+TITLE_WIDTH = 9  # Ширина названия поля в текстовом выводе
+VALUE_WIDTH = 15  # Ширина значения, более длинные значения выводятся на отдельной строке
+SEPARATOR = "-" * 60
+
+
+class TaskRenderer:
+    """Потоковый вывод задач. Раскладка колонок вычисляется один раз, строки пишутся в выходной поток пачками."""
+
+    def __init__(self, fmt='text', out=None, flush_every=1000):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}, доступны: {', '.join(FORMATS)}")
+        self.fmt = fmt
+        self.out = out or sys.stdout
+        self.flush_every = flush_every  # Сколько задач накапливать перед записью в выходной поток
+        self.names = [field_info.name for field_info in fields(Task)]
+        # Подписи полей заранее выровнены, как в print_tasks: "Название: "
+        self.titles = [f"{field_info.metadata.get('title', field_info.name):>{TITLE_WIDTH}}: "
+                       for field_info in fields(Task)]
+        self.format_task = {'text': self._text, 'tsv': self._tsv, 'jsonl': self._jsonl}[fmt]
+
+    def render(self, tasks: Iterable[Task]) -> int:
+        """Выводит задачи и возвращает их количество."""
+        buffer = ["\t".join(FILE_FIELDS) + "\n"] if self.fmt == 'tsv' else []
+        count = 0
+        for task in tasks:
+            buffer.append(self.format_task(task))
+            count += 1
+            if count % self.flush_every == 0:
+                self.out.write("".join(buffer))
+                buffer.clear()
+        self.out.write("".join(buffer))
+        self.out.flush()
+        return count
+
+    def _text(self, task: Task) -> str:
+        """Текстовая карточка задачи: короткие значения по два в строке, длинные - на отдельной строке."""
+        values = [str(getattr(task, name)) for name in self.names]
+        lines = []
+        index = 0
+        while index < len(values):
+            title, value = self.titles[index], values[index]
+            if len(value) > VALUE_WIDTH:
+                lines.append(f"{title}{value}")
+                index += 1
+            elif index + 1 < len(values):
+                lines.append(f"{title}{value:<{VALUE_WIDTH}}{self.titles[index + 1]}{values[index + 1]:<{VALUE_WIDTH}}")
+                index += 2
+            else:
+                lines.append(f"{title}{value:<{VALUE_WIDTH}}")
+                index += 1
+        lines.append(SEPARATOR)
+        return "\n".join(lines) + "\n"
+
+    def _tsv(self, task: Task) -> str:
+        """Строка TSV, табуляции и переводы строк в значениях экранируются."""
+        values = (str(getattr(task, name)) for name in self.names)
+        return "\t".join(value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+                         for value in values) + "\n"
+
+    def _jsonl(self, task: Task) -> str:
+        """Строка JSON Lines в формате экспорта."""
+        return json.dumps(task_to_record(task), ensure_ascii=False) + "\n"
@@ -0,0 +1,225 @@
+import csv
+import json
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from logging import getLogger
+
+from task_manager import TaskManager, CHUNK_SIZE, DONE_STATUSES, PRIORITY_RANKS, iso_date
+
+logger = getLogger(__name__)
+numpy = None  # Модуль NumPy после load_numpy(): дорогой импорт выполняется первым отчетом, а не при запуске
+_numpy_loaded = False
+
+REPORT_FORMATS = ('text', 'json', 'csv')
+PRIORITY_NAMES = {0: 'Не указан', **{rank: name.capitalize() for name, rank in PRIORITY_RANKS.items()}}
+# Номер дня срока (date.toordinal) считается в SQLite: julianday('0001-01-01') - 1721424.5 == 1.
+# Нераспознанный срок - 0, неизвестный приоритет - 0
+COLUMNS_QUERY = ('SELECT category, status, IFNULL(priority_rank, 0), '
+                 'IFNULL(CAST(julianday(due_on) - 1721424.5 AS INTEGER), 0) FROM {table}')
+
+
+def load_numpy():
+    """Импортирует NumPy при первом вызове. NumPy необязателен: без него (None) те же вычисления выполняются
+    над array.array средствами стандартной библиотеки."""
+    global numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy, _numpy_loaded = module, True
+    return numpy
+
+
+@dataclass
+class TaskColumns:
+    """Задачи в столбцах для отчетов: около 13 байт на задачу вместо сотен байт на объект Task.
+
+    Категории и статусы закодированы номерами (словари categories и statuses), приоритет - ранг,
+    срок - номер дня date.toordinal(). 0 в priority и due означает, что значение не распознано.
+    """
+    categories: list[str] = field(default_factory=list)
+    statuses: list[str] = field(default_factory=list)
+    category: array = field(default_factory=lambda: array('I'))
+    status: array = field(default_factory=lambda: array('I'))
+    priority: array = field(default_factory=lambda: array('b'))
+    due: array = field(default_factory=lambda: array('i'))
+
+    def __len__(self) -> int:
+        return len(self.category)
+
+    def done_codes(self) -> set[int]:
+        """Номера статусов выполненных задач."""
+        return {code for code, status in enumerate(self.statuses) if status.casefold() in DONE_STATUSES}
+
+
+def load_columns(manager, include_archive: bool = False, chunk_size: int = CHUNK_SIZE) -> TaskColumns:
+    """Читает из базы только нужные отчетам столбцы, порциями по chunk_size строк.
+
+    manager - TaskManager или ShardedTaskManager (читаются все шарды). С include_archive=True в отчет
+    попадают и задачи из архива.
+    """
+    columns = TaskColumns()
+    category_codes, status_codes = {}, {}
+    tables = ('tasks', 'tasks_archive') if include_archive else ('tasks',)
+    for shard in getattr(manager, 'shards', [manager]):
+        for table in tables:
+            cursor = shard.connection.execute(COLUMNS_QUERY.format(table=table))
+            while rows := cursor.fetchmany(chunk_size):
+                categories, statuses, priorities, dues = zip(*rows)
+                columns.category.extend(category_codes.setdefault(value, len(category_codes)) for value in categories)
+                columns.status.extend(status_codes.setdefault(value, len(status_codes)) for value in statuses)
+                columns.priority.extend(priorities)
+                columns.due.extend(dues)
+    columns.categories = list(category_codes)
+    columns.statuses = list(status_codes)
+    logger.debug("Загружено задач для отчета: %s", len(columns))
+    return columns
+
+
+def bincount(codes, size: int) -> list[int]:
+    """Число вхождений каждого номера от 0 до size - 1."""
+    if numpy is not None:
+        return numpy.bincount(numpy.asarray(codes, dtype=numpy.int64), minlength=size).tolist()
+    counts = Counter(codes)
+    return [counts.get(code, 0) for code in range(size)]
+
+
+def open_overdue(columns: TaskColumns, today: int) -> tuple:
+    """Номера категорий невыполненных задач и номера категорий просроченных среди них (срок раньше today)."""
+    done = columns.done_codes()
+    if numpy is not None:
+        category, due = numpy.asarray(columns.category), numpy.asarray(columns.due)
+        is_open = ~numpy.isin(numpy.asarray(columns.status), list(done))
+        return category[is_open], category[is_open & (due > 0) & (due < today)]
+    open_categories, overdue_categories = array('I'), array('I')
+    for category, status, due in zip(columns.category, columns.status, columns.due):
+        if status not in done:
+            open_categories.append(category)
+            if 0 < due < today:
+                overdue_categories.append(category)
+    return open_categories, overdue_categories
+
+
+def grouped_counts(columns: TaskColumns) -> dict[str, dict[str, int]]:
+    """Число задач по категориям, статусам и приоритетам."""
+    return {
+        'category': dict(zip(columns.categories, bincount(columns.category, len(columns.categories)))),
+        'status': dict(zip(columns.statuses, bincount(columns.status, len(columns.statuses)))),
+        'priority': {PRIORITY_NAMES[rank]: number
+                     for rank, number in enumerate(bincount(columns.priority, len(PRIORITY_NAMES))) if number},
+    }
+
+
+def ratio(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def overdue_report(columns: TaskColumns, today: date) -> dict:
+    """Доля просроченных среди невыполненных задач, всего и по категориям."""
+    open_categories, overdue_categories = open_overdue(columns, today.toordinal())
+    open_counts = bincount(open_categories, len(columns.categories))
+    overdue_counts = bincount(overdue_categories, len(columns.categories))
+    by_category = {name: {'open': opened, 'overdue': overdue, 'ratio': ratio(overdue, opened)}
+                   for name, opened, overdue in zip(columns.categories, open_counts, overdue_counts) if opened}
+    total_open, total_overdue = sum(open_counts), sum(overdue_counts)
+    return {'open': total_open, 'overdue': total_overdue, 'ratio': ratio(total_overdue, total_open),
+            'by_category': by_category}
+
+
+def weekly_due(columns: TaskColumns) -> dict[str, dict[str, int]]:
+    """Число задач со сроком на каждой неделе (ключ - понедельник недели) и сколько из них не выполнено."""
+    done = columns.done_codes()
+    # date(1, 1, 1) - понедельник, поэтому номер недели срока - (номер дня - 1) // 7
+    if numpy is not None:
+        due = numpy.asarray(columns.due)
+        dated = due > 0
+        weeks = (due[dated] - 1) // 7
+        is_open = ~numpy.isin(numpy.asarray(columns.status)[dated], list(done))
+        total = dict(zip(*(values.tolist() for values in numpy.unique(weeks, return_counts=True))))
+        opened = dict(zip(*(values.tolist() for values in numpy.unique(weeks[is_open], return_counts=True))))
+    else:
+        total, opened = Counter(), Counter()
+        for status, due in zip(columns.status, columns.due):
+            if due:
+                total[(due - 1) // 7] += 1
+                if status not in done:
+                    opened[(due - 1) // 7] += 1
+    return {date.fromordinal(week * 7 + 1).isoformat(): {'total': number, 'open': opened.get(week, 0)}
+            for week, number in sorted(total.items())}
+
+
+def priority_by_category(columns: TaskColumns) -> dict[str, dict[str, int]]:
+    """Число задач каждого приоритета в каждой категории."""
+    width = len(PRIORITY_NAMES)
+    if numpy is not None:
+        cells = numpy.asarray(columns.category, dtype=numpy.int64) * width + numpy.asarray(columns.priority)
+    else:
+        cells = (category * width + rank for category, rank in zip(columns.category, columns.priority))
+    counts = bincount(cells, len(columns.categories) * width)
+    return {name: {PRIORITY_NAMES[rank]: number
+                   for rank, number in enumerate(counts[code * width:(code + 1) * width]) if number}
+            for code, name in enumerate(columns.categories)}
+
+
+def build_report(manager: TaskManager, today: date | str | None = None, include_archive: bool = False) -> dict:
+    """Отчет по задачам: счетчики, просроченные, сроки по неделям и приоритеты по категориям."""
+    load_numpy()
+    today = date.fromisoformat(iso_date(today or date.today()))
+    columns = load_columns(manager, include_archive)
+    return {
+        'today': today.isoformat(),
+        'tasks': len(columns),
+        'engine': 'numpy' if numpy is not None else 'array',
+        'counts': grouped_counts(columns),
+        'overdue': overdue_report(columns, today),
+        'weekly_due': weekly_due(columns),
+        'priority_by_category': priority_by_category(columns),
+    }
+
+
+def report_rows(report: dict) -> list[tuple]:
+    """Строки отчета для CSV: (раздел, группа, показатель, значение)."""
+    rows = [('tasks', '', 'total', report['tasks'])]
+    rows.extend(('counts', dimension, value, number)
+                for dimension, counts in report['counts'].items() for value, number in counts.items())
+    rows.extend(('overdue', '', key, report['overdue'][key]) for key in ('open', 'overdue', 'ratio'))
+    rows.extend(('overdue', category, key, value)
+                for category, values in report['overdue']['by_category'].items() for key, value in values.items())
+    rows.extend(('weekly_due', week, key, value)
+                for week, values in report['weekly_due'].items() for key, value in values.items())
+    rows.extend(('priority_by_category', category, priority, number)
+                for category, values in report['priority_by_category'].items() for priority, number in values.items())
+    return rows
+
+
+def format_report(report: dict) -> str:
+    """Отчет текстом."""
+    overdue = report['overdue']
+    lines = [f"Отчет на {report['today']}, задач: {report['tasks']}",
+             f"Просрочено: {overdue['overdue']} из {overdue['open']} невыполненных ({overdue['ratio']:.1%})"]
+    lines.extend(f"{values['overdue']:>10} из {values['open']:<6} {values['ratio']:>7.1%}  {category}"
+                 for category, values in overdue['by_category'].items())
+    lines.append("Сроки по неделям (всего / не выполнено):")
+    lines.extend(f"{week:>12}  {values['total']:>8} / {values['open']}"
+                 for week, values in report['weekly_due'].items())
+    lines.append("Приоритеты по категориям:")
+    for category, counts in report['priority_by_category'].items():
+        lines.append(f"    {category}: " + ", ".join(f"{priority} {number}" for priority, number in counts.items()))
+    return "\n".join(lines)
+
+
+def write_report(report: dict, fmt: str, out) -> None:
+    """Записывает отчет в поток out в формате 'text', 'json' или 'csv'."""
+    if fmt == 'json':
+        out.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+    elif fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(('section', 'group', 'key', 'value'))
+        writer.writerows(report_rows(report))
+    elif fmt == 'text':
+        out.write(format_report(report) + '\n')
+    else:
+        raise ValueError(f"Неизвестный формат отчета: {fmt}, доступны: {', '.join(REPORT_FORMATS)}")
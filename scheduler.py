@@ -0,0 +1,162 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from logging import getLogger
+
+from task_manager import TaskManager, TaskChange, DONE_STATUSES, iso_date
+
+
+class DeadlineScheduler:
+    """Расписание сроков невыполненных задач поверх TaskManager.
+
+    Пока расписание не построено, запросы выполняются по индексу idx_tasks_due_on и читают только нужные строки:
+    так разовые команды не просматривают все задачи со сроком. Для долгоживущих процессов (интерактивный режим,
+    напоминания) расписание строится rebuild() или start_reminders(): ключи (срок ISO, -ранг приоритета, ID)
+    хранятся в отсортированном списке и находятся двоичным поиском за O(log n + k). Построенное расписание
+    обновляется только по журналу изменений (changes_since), поэтому видит записи любых менеджеров и процессов
+    и не просматривает таблицу задач повторно.
+    """
+    logger = getLogger(__name__)
+
+    def __init__(self, manager: TaskManager):
+        if not isinstance(manager, TaskManager):  # Журнал изменений и номера изменений у каждого шарда свои
+            raise ValueError("Расписание сроков строится по одной базе, база из шардов не поддерживается")
+        self.manager = manager
+        self._keys = []  # Отсортированные ключи (due_on, -priority_rank, id)
+        self._key_of = {}  # ID задачи -> ее ключ в _keys
+        self._seq = None  # Номер последнего примененного изменения, None - расписание еще не построено
+        self._lock = threading.RLock()
+        self._reminder = None
+        self._reminder_stop = threading.Event()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._keys)
+
+    @staticmethod
+    def _key(task_id: int, due_on: str | None, rank: int | None, status: str) -> tuple | None:
+        """Ключ расписания или None, если задача выполнена (DONE_STATUSES) или у нее нет корректного срока."""
+        if due_on is None or status.casefold() in DONE_STATUSES:
+            return None
+        return due_on, -(rank or 0), task_id
+
+    def rebuild(self) -> None:
+        """Строит расписание заново одним запросом по индексу срока."""
+        with self._lock:
+            seq = self.manager.last_change_seq()  # Изменения после этого номера будут применены повторно
+            rows = self.manager.execute_query(
+                'SELECT id, due_on, priority_rank, status FROM tasks WHERE due_on IS NOT NULL '
+                'ORDER BY due_on, priority_rank DESC, id', one_line=False)
+            keys = [key for row in rows if (key := self._key(*row)) is not None]
+            keys.sort()  # Почти отсортировано запросом, сортировка только выравнивает задачи без приоритета
+            self._keys = keys
+            self._key_of = {key[2]: key for key in keys}
+            self._seq = seq
+            self.refresh()
+        self.logger.debug("Расписание сроков построено: %s задач", len(keys))
+
+    def refresh(self) -> int:
+        """Применяет изменения задач из журнала, появившиеся с прошлого обновления. Возвращает их число."""
+        with self._lock:
+            if self._seq is None:
+                self.rebuild()
+                return 0
+            last = self.manager.last_change_seq()
+            if last == self._seq:  # Частый случай при постоянном опросе: изменений нет
+                return 0
+            first = self.manager.execute_query('SELECT MIN(seq) FROM task_changes')[0]
+            # База восстановлена из копии (журнал стал короче) или нужные изменения уже удалены prune_changes()
+            if last < self._seq or first is None or first > self._seq + 1:
+                self.rebuild()
+                return 0
+            applied = 0
+            for change in self.manager.changes_since(self._seq):
+                self._apply(change)
+                self._seq = change.seq
+                applied += 1
+            return applied
+
+    def _apply(self, change: TaskChange) -> None:
+        """Обновляет ключ задачи по одному изменению."""
+        old = self._key_of.pop(change.task_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        new = None
+        if change.task is not None:  # Срок и ранг берутся из журнала, где их вычислила SQLite, - как в rebuild()
+            new = self._key(change.task_id, change.due_on, change.priority_rank, change.task.status)
+        if new is not None:
+            insort(self._keys, new)
+            self._key_of[change.task_id] = new
+
+    def _query(self, start: str | None, end: str | None, limit: int | None = None) -> list[int]:
+        """ID задач со сроком в [start, end) одним запросом по индексу idx_tasks_due_on, без расписания."""
+        done = self.manager._matching_values('tasks', 'status', DONE_STATUSES)
+        query = f'SELECT id FROM tasks WHERE due_on >= ? AND status NOT IN ({", ".join("?" * len(done))})'
+        params = [start or '', *done]  # Любой распознанный срок не меньше пустой строки
+        if end is not None:
+            query += ' AND due_on < ?'
+            params.append(end)
+        query += ' ORDER BY due_on, priority_rank DESC, id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [row[0] for row in self.manager.execute_query(query, params, one_line=False)]
+
+    def _slice(self, start: str | None, end: str | None, limit: int | None = None) -> list[int]:
+        """ID задач со сроком в [start, end) по возрастанию срока и убыванию приоритета."""
+        with self._lock:
+            if self._seq is None:  # Расписание не построено - разовый запрос по индексу
+                return self._query(start, end, limit)
+            self.refresh()
+            low = 0 if start is None else bisect_left(self._keys, (start,))
+            high = len(self._keys) if end is None else bisect_left(self._keys, (end,))
+            if limit is not None:
+                high = min(high, low + limit)
+            return [key[2] for key in self._keys[low:high]]
+
+    def overdue(self, today: date | str | None = None) -> list[int]:
+        """Невыполненные задачи со сроком раньше сегодняшнего дня (или today)."""
+        return self._slice(None, iso_date(today or date.today()))
+
+    def upcoming(self, count: int = 10, today: date | str | None = None) -> list[int]:
+        """Ближайшие count невыполненных задач со сроком начиная с сегодняшнего дня (или today)."""
+        return self._slice(iso_date(today or date.today()), None, count)
+
+    def due_between(self, start: date | str, end: date | str) -> list[int]:
+        """Невыполненные задачи со сроком в диапазоне от start до end включительно."""
+        return self._slice(iso_date(start), (date.fromisoformat(iso_date(end)) + timedelta(days=1)).isoformat())
+
+    def start_reminders(self, callback, interval_s: float = 60, days_ahead: int = 0) -> None:
+        """Запускает фоновый поток напоминаний: раз в interval_s секунд callback(task) вызывается для каждой
+        невыполненной задачи, срок которой наступил или наступит в ближайшие days_ahead дней. О задаче
+        напоминается один раз на каждый ее срок."""
+        if self._reminder is not None:
+            raise RuntimeError("Напоминания уже запущены")
+        self._reminder_stop.clear()
+        self._reminder = threading.Thread(target=self._remind_loop, args=(callback, interval_s, days_ahead),
+                                          name='task-reminders', daemon=True)
+        self._reminder.start()
+
+    def stop_reminders(self) -> None:
+        if self._reminder is not None:
+            self._reminder_stop.set()
+            self._reminder.join()
+            self._reminder = None
+
+    def _remind_loop(self, callback, interval_s: float, days_ahead: int) -> None:
+        reminded = set()  # (ID, срок) задач, о которых уже напомнили
+        while True:
+            try:
+                end = (date.today() + timedelta(days=days_ahead + 1)).isoformat()
+                with self._lock:
+                    self.refresh()
+                    due = [key for key in self._keys[:bisect_left(self._keys, (end,))]
+                           if (key[2], key[0]) not in reminded]
+                for task in self.manager.get_task([key[2] for key in due]):
+                    callback(task)
+                reminded.update((key[2], key[0]) for key in due)
+            except Exception as error:  # Ошибка в callback не должна останавливать напоминания
+                self.logger.error("Ошибка в цикле напоминаний: %s", error)
+            if self._reminder_stop.wait(interval_s):
+                return
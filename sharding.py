@@ -0,0 +1,276 @@
+import heapq
+import threading
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import count, islice, repeat
+from logging import getLogger
+from pathlib import Path
+
+from task_manager import TaskManager, Task, CacheInfo, ORDER_BY, search_sort_key
+
+PARTITIONS = ('id', 'category')
+
+
+def shard_files(db_name: str, shards: int) -> list[str]:
+    """Файлы шардов рядом с db_name: tasks.db -> tasks.0.db, tasks.1.db, ..."""
+    path = Path(db_name)
+    return [str(path.with_name(f"{path.stem}.{number}{path.suffix or '.db'}")) for number in range(shards)]
+
+
+class ShardedTaskManager:
+    """Хранилище задач, разделенное на несколько файлов SQLite (шардов), с тем же API, что у TaskManager.
+
+    Каждый шард - обычный TaskManager. Глобальный ID задачи кодирует шард: id = локальный_id * shards + номер_шарда,
+    поэтому чтение, изменение и удаление по ID обращаются к одному шарду, а шарды выдают ID независимо.
+    Новые задачи распределяются по шардам по очереди (partition='id') или по категории (partition='category':
+    все задачи категории попадают в один шард). Поиск и выборки по нескольким ID выполняются во всех шардах
+    параллельно в пуле потоков (SQLite отпускает GIL на время запроса), результаты объединяются.
+
+    Число шардов и способ разделения для набора файлов менять нельзя: от них зависят ID задач.
+    Транзакции атомарны в пределах шарда, общей транзакции для нескольких файлов нет.
+    """
+    logger = getLogger(__name__)
+
+    def __init__(self, db_name='tasks.db', shards=4, partition='id', verbose=True, **options):
+        if shards < 1:
+            raise ValueError("Число шардов должно быть положительным")
+        if partition not in PARTITIONS:
+            raise ValueError(f"Неизвестный способ разделения: {partition}, доступны: {', '.join(PARTITIONS)}")
+        extra = shard_files(db_name, shards + 1)[-1]
+        if Path(extra).exists():  # ID задач из этого файла были бы расшифрованы неверно
+            raise ValueError(f"Найден шард {extra}: набор создан с большим числом шардов")
+        self.db_name = db_name
+        self.partition = partition
+        self.verbose = verbose
+        self.shards = [TaskManager(name, verbose=False, **options) for name in shard_files(db_name, shards)]
+        self.stats = None  # Статистика запросов ведется в каждом шарде, см. metrics()
+        self._pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix='task-shard')
+        self._next_shard = None  # Счетчик очереди шардов для partition='id', создается при первой записи
+        self._next_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _say(self, *args, **kwargs) -> None:
+        """Печатает сообщение для пользователя, если менеджер создан с verbose=True."""
+        if self.verbose:
+            print(*args, **kwargs)
+
+    def _locate(self, task_id: int) -> tuple[TaskManager, int]:
+        """Шард и локальный ID по глобальному ID."""
+        local_id, number = divmod(task_id, len(self.shards))
+        return self.shards[number], local_id
+
+    def _global_id(self, number: int, local_id: int) -> int:
+        return local_id * len(self.shards) + number
+
+    def _local_after(self, number: int, after_id: int | None) -> int | None:
+        """Граница after_id в локальных ID шарда: глобальный id > after_id <=> локальный > (after_id - номер) // N."""
+        return None if after_id is None else (after_id - number) // len(self.shards)
+
+    def _globalize(self, number: int, task: Task) -> Task:
+        task.task_id = self._global_id(number, task.task_id)
+        return task
+
+    def _shard_for(self, task: Task) -> int:
+        """Номер шарда для новой задачи."""
+        if self.partition == 'category':  # crc32 стабилен между запусками, в отличие от hash()
+            return zlib.crc32(task.category.casefold().encode('utf-8')) % len(self.shards)
+        with self._next_lock:
+            if self._next_shard is None:
+                self._next_shard = count(self._first_shard())
+            return next(self._next_shard) % len(self.shards)
+
+    def _first_shard(self) -> int:
+        """С какого шарда продолжить очередь: с того, где выдано меньше всего ID. Так очередь продолжается
+        и между запусками, а новые глобальные ID возрастают."""
+        def last_id(shard):
+            row = shard.execute_query("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+            return row[0] if row else 0
+        return min(range(len(self.shards)), key=lambda number: (last_id(self.shards[number]), number))
+
+    def _map(self, func, items) -> list:
+        """Выполняет func для каждого элемента параллельно, результаты в порядке элементов.
+
+        Внутри transaction() все выполняется в текущем потоке: у потоков пула свои соединения, они не видели бы
+        незафиксированных изменений транзакции и ждали бы ее блокировки записи.
+        """
+        if any(shard._transaction_depth() for shard in self.shards):
+            return [func(item) for item in items]
+        return list(self._pool.map(func, items))
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+    def snapshot(self, path) -> None:
+        """Сохраняет копию каждого шарда в файлы рядом с path (copy.db -> copy.0.db, copy.1.db, ...).
+
+        Копии шардов делаются по очереди и не образуют общего снимка на один момент времени.
+        """
+        for shard, target in zip(self.shards, shard_files(path, len(self.shards))):
+            shard.snapshot(target)
+
+    def restore(self, path) -> None:
+        """Восстанавливает шарды из копий, сохраненных snapshot(path) с тем же числом шардов."""
+        sources = shard_files(path, len(self.shards))
+        missing = [source for source in sources if not Path(source).exists()]
+        if missing:  # Проверяем до начала, чтобы не восстановить только часть шардов
+            raise FileNotFoundError(f"Нет файлов снимка: {', '.join(missing)}")
+        for shard, source in zip(self.shards, sources):
+            shard.restore(source)
+
+    def flush(self) -> None:
+        for shard in self.shards:
+            shard.flush()
+
+    @contextmanager
+    def transaction(self):
+        """Транзакция в каждом шарде: при ошибке все откатываются, коммиты шардов выполняются по очереди."""
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.transaction())
+            yield self
+
+    def get_task(self, task_id: int | list[int] | None = None,
+                 include_archive: bool = False) -> Task | list[Task] | None:
+        """Задача по ID, задачи по списку ID или все задачи, если ID не указаны."""
+        if task_id is None or isinstance(task_id, list):
+            return list(self.iter_tasks(task_id, include_archive=include_archive))
+        shard, local_id = self._locate(task_id)
+        task = shard.get_task(local_id, include_archive)
+        if task is None:
+            self._say(f'Задача с ID {task_id} не найдена')
+            return None
+        task.task_id = task_id
+        return task
+
+    def iter_tasks(self, task_ids: Iterable[int] | None = None, chunk_size: int = 500, after_id: int = None,
+                   limit: int = None, offset: int = 0, include_archive: bool = False) -> Iterator[Task]:
+        """Задачи в порядке переданных ID или все задачи по возрастанию глобального ID (потоковое слияние шардов)."""
+        if task_ids is None:
+            per_shard = None if limit is None else limit + offset  # Страница целиком может оказаться в одном шарде
+            streams = [map(self._globalize, repeat(number),
+                           shard.iter_tasks(chunk_size=chunk_size, after_id=self._local_after(number, after_id),
+                                            limit=per_shard, include_archive=include_archive))
+                       for number, shard in enumerate(self.shards)]
+            merged = heapq.merge(*streams, key=lambda task: task.task_id)
+            yield from islice(merged, offset, None if limit is None else offset + limit)
+            return
+        task_ids = iter(task_ids)
+        while chunk := list(islice(task_ids, chunk_size)):
+            groups = defaultdict(list)
+            for task_id in chunk:
+                local_id, number = divmod(task_id, len(self.shards))
+                groups[number].append(local_id)
+            numbers = list(groups)
+            found = {}
+            shard_results = self._map(lambda n: self.shards[n].get_task(groups[n], include_archive), numbers)
+            for number, shard_tasks in zip(numbers, shard_results):
+                found.update((task.task_id, task) for task in map(self._globalize, repeat(number), shard_tasks))
+            yield from (found[task_id] for task_id in chunk if task_id in found)
+
+    def add_task(self, task: Task) -> int:
+        number = self._shard_for(task)
+        return self._global_id(number, self.shards[number].add_task(task))
+
+    def bulk_add(self, tasks: Iterable[Task], batch_size: int = 1000, progress=None) -> int:
+        """Добавляет задачи пакетами, каждый пакет делится по шардам и записывается в них параллельно."""
+        tasks = iter(tasks)
+        added = 0
+        while batch := list(islice(tasks, batch_size)):
+            groups = defaultdict(list)
+            for task in batch:
+                groups[self._shard_for(task)].append(task)
+            self._map(lambda number: self.shards[number].bulk_add(groups[number], batch_size), list(groups))
+            added += len(batch)
+            if progress:
+                progress(added)
+        self.logger.debug("Пакетно добавлено задач в %s шардов: %s", len(self.shards), added)
+        return added
+
+    def update_task(self, task_id: int, **kwargs) -> Task | str:
+        shard, local_id = self._locate(task_id)
+        task = shard.update_task(local_id, **kwargs)
+        if isinstance(task, Task):
+            task.task_id = task_id
+        return task
+
+    def delete_task(self, task_id: int) -> None | int:
+        shard, local_id = self._locate(task_id)
+        task = shard.get_task(local_id)
+        if task is None or shard.delete_task(local_id) is None:
+            return None
+        self._say(f'Задача "{task.title}" с ID {task_id} удалена')
+        return task_id
+
+    def delete_where(self, category=None, status=None, before_date=None) -> int:
+        if not (category or status or before_date):
+            raise ValueError("Не задано ни одного условия удаления")
+        return sum(self._map(lambda shard: shard.delete_where(category, status, before_date), self.shards))
+
+    def archive(self, before_date) -> int:
+        """Переносит выполненные задачи в архив каждого шарда параллельно."""
+        return sum(self._map(lambda shard: shard.archive(before_date), self.shards))
+
+    def cleanup_database(self) -> None:
+        self._map(lambda shard: shard.cleanup_database(), self.shards)
+
+    def categories(self) -> list[str]:
+        """Различные категории всех шардов."""
+        return list(self.summary()['category'])
+
+    def summary(self) -> dict[str, dict[str, int]]:
+        """Сумма сводок шардов."""
+        result = {'category': {}, 'status': {}, 'priority': {}}
+        for summary in self._map(TaskManager.summary, self.shards):
+            for dimension, counts in summary.items():
+                for value, number in counts.items():
+                    result[dimension][value] = result[dimension].get(value, 0) + number
+        return {dimension: dict(sorted(counts.items())) for dimension, counts in result.items()}
+
+    def search_tasks(self, keyword=None, category=None, status=None, priority=None, due_from=None, due_to=None,
+                     order_by=None, after_id=None, limit=None, offset=0, include_archive=False) -> list[int]:
+        """Поиск во всех шардах параллельно. Каждый шард возвращает свою первую страницу вместе с ключами
+        сортировки, объединенный результат сортируется по тем же ключам и обрезается до страницы.
+
+        Релевантность bm25 считается по статистике слов своего шарда, поэтому порядок по релевантности
+        между шардами приблизительный.
+        """
+        if order_by is not None and order_by not in ORDER_BY:
+            raise ValueError(f"Неизвестная сортировка: {order_by}, доступны: {', '.join(ORDER_BY)}")
+        per_shard = None if limit is None else limit + offset
+
+        def search(number):
+            arguments = (keyword, category, status, priority, due_from, due_to, order_by,
+                         self._local_after(number, after_id), per_shard)
+            rows = self.shards[number]._search_rows(*arguments, keys=True)
+            if include_archive:
+                rows += self.shards[number]._search_rows(*arguments, keys=True, archive=True)
+            return [(self._global_id(number, task_id), *keys) for task_id, *keys in rows]
+
+        rows = [row for shard_rows in self._map(search, range(len(self.shards))) for row in shard_rows]
+        rows.sort(key=search_sort_key(keyword, order_by))
+        result = [row[0] for row in rows[offset:None if limit is None else offset + limit]]
+        self._say("-" * 60, f"найдено  задач: {len(result)}", "-" * 60, sep="\n")
+        self.logger.debug("Поиск по %s шардам: найдено %s задач", len(self.shards), len(result))
+        return result
+
+    def cache_info(self) -> CacheInfo:
+        """Суммарная статистика LRU-кэшей шардов."""
+        return CacheInfo(*map(sum, zip(*(shard.cache_info() for shard in self.shards))))
+
+    def search_cache_info(self) -> CacheInfo:
+        """Кэш результатов поиска у шардированного хранилища не ведется: поиск объединяет страницы шардов."""
+        return CacheInfo(0, 0, 0, 0)
+
+    def metrics(self) -> dict:
+        """Метрики каждого шарда."""
+        return {'shards': {shard.db_name: shard.metrics() for shard in self.shards}}
@@ -0,0 +1,67 @@
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import fields
+from pathlib import Path
+
+from task_manager import Task
+
+FORMATS = ('.jsonl', '.csv')
+# В файлах ID задачи хранится под ключом "id", как в примере структуры данных из README
+FILE_FIELDS = ['id' if field_info.name == 'task_id' else field_info.name for field_info in fields(Task)]
+REQUIRED_FIELDS = ('title', 'description', 'category', 'due_date', 'priority')
+
+
+def file_format(file_path) -> str:
+    """Определяет формат файла по расширению."""
+    suffix = Path(file_path).suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Неподдерживаемый формат файла '{suffix}', доступны: {', '.join(FORMATS)}")
+    return suffix
+
+
+def record_to_task(record: dict, line: int) -> Task:
+    """Создает задачу из записи файла. ID задачи из файла не используется - база присвоит новый."""
+    missing = [name for name in REQUIRED_FIELDS if not record.get(name)]
+    if missing:
+        raise ValueError(f"Строка {line}: не заполнены поля {', '.join(missing)}")
+    task_data = {name: str(record[name]) for name in REQUIRED_FIELDS}
+    if record.get('status'):
+        task_data['status'] = str(record['status'])
+    return Task(task_id=0, **task_data)
+
+
+def task_to_record(task: Task) -> dict:
+    """Преобразует задачу в запись для файла."""
+    return dict(zip(FILE_FIELDS, (getattr(task, field_info.name) for field_info in fields(Task))))
+
+
+def read_tasks(file_path) -> Iterator[Task]:
+    """Потоково читает задачи из файла JSONL или CSV."""
+    suffix = file_format(file_path)
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        if suffix == '.jsonl':
+            for line, text in enumerate(f, start=1):
+                if text.strip():  # Пустые строки пропускаем
+                    yield record_to_task(json.loads(text), line)
+        else:
+            for line, record in enumerate(csv.DictReader(f), start=2):  # Первая строка - заголовок
+                yield record_to_task(record, line)
+
+
+def write_tasks(tasks: Iterable[Task], file_path) -> int:
+    """Потоково записывает задачи в файл JSONL или CSV. Возвращает число записанных задач."""
+    suffix = file_format(file_path)
+    written = 0
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        if suffix == '.jsonl':
+            for task in tasks:
+                f.write(json.dumps(task_to_record(task), ensure_ascii=False) + '\n')
+                written += 1
+        else:
+            writer = csv.DictWriter(f, fieldnames=FILE_FIELDS)
+            writer.writeheader()
+            for task in tasks:
+                writer.writerow(task_to_record(task))
+                written += 1
+    return written
@@ -1,11 +1,45 @@
-from log_dir.setup_logging import *  # нужно для логирования при тестировании! Не удалять!!!
+from log_dir.setup_logging import setup_logging  # нужно для логирования при тестировании! Не удалять!!!
 from logging import getLogger
-import functools
+import heapq
+import json
+import re
+import os
+import random
 import sqlite3
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from collections import OrderedDict, namedtuple
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import count, islice
+from operator import attrgetter
+from pathlib import Path
 
+from query_stats import QueryStats
 
-@dataclass
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+INSERT_TASK = '''INSERT INTO tasks (title, description, category, due_date, priority, status)
+                 VALUES (?, ?, ?, ?, ?, ?)'''
+
+
+class CacheInfo(namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])):
+    __slots__ = ()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля обращений, обслуженных кэшем."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+CHUNK_SIZE = 500  # Сколько ID передавать в один запрос IN (...) и сколько строк читать из курсора за раз
+
+
+@dataclass(slots=True)  # Без __dict__ у каждого экземпляра: меньше памяти на миллионы задач
 class Task:
     task_id: int = field(metadata={"title": "ID задачи"})
     title: str = field(metadata={"title": "Название"})
@@ -16,119 +50,1053 @@ class Task:
     status: str = field(metadata={"title": "Статус"}, default="Не выполнена")
 
 
-def sync_with_search_db(func):  # Синхронизация с базой данных
-    @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
-        search_result = 'еще не выполнена'
-        if not self.is_search_db:  # Проверка, не является ли это экземпляром для базы данных поиска
-            search_mgr = TaskManager(db_name="search_tasks.db", is_search_db=True)
-            modified_args = [Task(**{field: val.lower() if isinstance(val, str) else val for field, val in
-                                     arg.__dict__.items()}) if isinstance(arg, Task) else arg for arg in args]
-            modified_kwargs = {k: v.lower() if isinstance(v, str) else v for k, v in kwargs.items()}
-            search_result = func(search_mgr, *modified_args, **modified_kwargs)
+@dataclass(slots=True)
+class TaskChange:
+    """Запись журнала изменений: операция над задачей и ее состояние после операции (для удаления None)."""
+    seq: int
+    task_id: int
+    operation: str  # 'insert', 'update' или 'delete'
+    changed_at: str  # Время UTC в формате ISO
+    task: Task | None
+    due_on: str | None = None  # Срок ISO и ранг приоритета, как их вычислила SQLite (tasks.due_on, priority_rank)
+    priority_rank: int | None = None
+
+
+# Миграции схемы: номер версии в PRAGMA user_version равен числу примененных миграций.
+# Скрипты идемпотентны там, где это возможно, чтобы подхватывать базы, созданные до появления версий.
+MIGRATIONS = (
+    # 1: таблица задач
+    '''
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        category TEXT NOT NULL,
+        due_date TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Не выполнена'
+    );
+    ''',
+    # 2: полнотекстовый индекс поверх tasks (external content), unicode61 приводит кириллицу к нижнему регистру
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, category, status,
+        content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 0'
+    );
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, category, status)
+        VALUES (new.id, new.title, new.description, new.category, new.status);
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, category, status)
+        VALUES ('delete', old.id, old.title, old.description, old.category, old.status);
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, category, status ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, category, status)
+        VALUES ('delete', old.id, old.title, old.description, old.category, old.status);
+        INSERT INTO tasks_fts(rowid, title, description, category, status)
+        VALUES (new.id, new.title, new.description, new.category, new.status);
+    END;
+    INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild');
+    ''',
+    # 3: сортируемые срок (ISO ГГГГ-ММ-ДД) и ранг приоритета, индексы для фильтров и сортировки
+    '''
+    ALTER TABLE tasks ADD COLUMN due_on TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN due_date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'
+                THEN substr(due_date, 7, 4) || '-' || substr(due_date, 4, 2) || '-' || substr(due_date, 1, 2)
+            WHEN due_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' THEN due_date
+        END
+    ) VIRTUAL;
+    ALTER TABLE tasks ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS (
+        CASE
+            WHEN priority IN ('Высокий', 'высокий', 'ВЫСОКИЙ') THEN 3
+            WHEN priority IN ('Средний', 'средний', 'СРЕДНИЙ') THEN 2
+            WHEN priority IN ('Низкий', 'низкий', 'НИЗКИЙ') THEN 1
+        END
+    ) VIRTUAL;
+    CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category);
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+    CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority_rank DESC, due_on);
+    CREATE INDEX IF NOT EXISTS idx_tasks_due_on ON tasks (due_on, priority_rank DESC);
+    ''',
+    # 4: журнал изменений задач. Номер seq только растет, data - строка задачи после изменения (JSON-массив
+    # в порядке полей Task), для удаления NULL. Уже существующие задачи попадают в журнал как добавленные
+    '''
+    CREATE TABLE IF NOT EXISTS task_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+        data TEXT
+    );
+    CREATE TRIGGER IF NOT EXISTS task_changes_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_changes (task_id, operation, data)
+        VALUES (new.id, 'insert',
+                json_array(new.id, new.title, new.description, new.category, new.due_date, new.priority, new.status));
+    END;
+    CREATE TRIGGER IF NOT EXISTS task_changes_update AFTER UPDATE ON tasks BEGIN
+        INSERT INTO task_changes (task_id, operation, data)
+        VALUES (new.id, 'update',
+                json_array(new.id, new.title, new.description, new.category, new.due_date, new.priority, new.status));
+    END;
+    CREATE TRIGGER IF NOT EXISTS task_changes_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_changes (task_id, operation) VALUES (old.id, 'delete');
+    END;
+    INSERT INTO task_changes (task_id, operation, data)
+        SELECT id, 'insert', json_array(id, title, description, category, due_date, priority, status)
+        FROM tasks ORDER BY id;
+    ''',
+    # 5: число задач по категориям, статусам и приоритетам, поддерживается триггерами. Строки с нулем удаляются
+    '''
+    CREATE TABLE IF NOT EXISTS task_stats (
+        dimension TEXT NOT NULL CHECK (dimension IN ('category', 'status', 'priority')),
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (dimension, value)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS task_stats_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_stats VALUES ('category', new.category, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO task_stats VALUES ('status', new.status, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO task_stats VALUES ('priority', new.priority, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS task_stats_delete AFTER DELETE ON tasks BEGIN
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'category' AND value = old.category;
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'status' AND value = old.status;
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'priority' AND value = old.priority;
+        DELETE FROM task_stats WHERE count = 0 AND (dimension, value) IN
+            (VALUES ('category', old.category), ('status', old.status), ('priority', old.priority));
+    END;
+    CREATE TRIGGER IF NOT EXISTS task_stats_update AFTER UPDATE OF category, status, priority ON tasks
+    WHEN old.category IS NOT new.category OR old.status IS NOT new.status OR old.priority IS NOT new.priority BEGIN
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'category' AND value = old.category;
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'status' AND value = old.status;
+        UPDATE task_stats SET count = count - 1 WHERE dimension = 'priority' AND value = old.priority;
+        INSERT INTO task_stats VALUES ('category', new.category, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO task_stats VALUES ('status', new.status, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO task_stats VALUES ('priority', new.priority, 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        DELETE FROM task_stats WHERE count = 0 AND (dimension, value) IN
+            (VALUES ('category', old.category), ('status', old.status), ('priority', old.priority));
+    END;
+    DELETE FROM task_stats;
+    INSERT INTO task_stats SELECT 'category', category, COUNT(*) FROM tasks GROUP BY category;
+    INSERT INTO task_stats SELECT 'status', status, COUNT(*) FROM tasks GROUP BY status;
+    INSERT INTO task_stats SELECT 'priority', priority, COUNT(*) FROM tasks GROUP BY priority;
+    ''',
+    # 6: архив выполненных задач (см. archive). ID задач сохраняются: AUTOINCREMENT не выдает их повторно.
+    # Описание хранится сжатым zlib, срок и ранг приоритета копируются из tasks. Полнотекстовый индекс архива
+    # без содержимого (content=''): в нем только слова, сами тексты лежат в tasks_archive
+    '''
+    CREATE TABLE IF NOT EXISTS tasks_archive (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        description BLOB NOT NULL,
+        category TEXT NOT NULL,
+        due_date TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        status TEXT NOT NULL,
+        due_on TEXT,
+        priority_rank INTEGER,
+        archived_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_archive_category ON tasks_archive (category);
+    CREATE INDEX IF NOT EXISTS idx_tasks_archive_status ON tasks_archive (status);
+    CREATE INDEX IF NOT EXISTS idx_tasks_archive_priority ON tasks_archive (priority_rank DESC, due_on);
+    CREATE INDEX IF NOT EXISTS idx_tasks_archive_due_on ON tasks_archive (due_on, priority_rank DESC);
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_archive_fts USING fts5(
+        title, description, category, status, content='', tokenize='unicode61 remove_diacritics 0'
+    );
+    ''',
+    # 7: журнал изменений хранит и срок ISO с рангом приоритета из генерируемых столбцов, чтобы потребители
+    # журнала (расписание сроков) не вычисляли их по-своему. Записи, сделанные раньше, дополняются тем же выражением
+    '''
+    DROP TRIGGER IF EXISTS task_changes_insert;
+    CREATE TRIGGER task_changes_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_changes (task_id, operation, data)
+        VALUES (new.id, 'insert', json_array(new.id, new.title, new.description, new.category, new.due_date,
+                                             new.priority, new.status, new.due_on, new.priority_rank));
+    END;
+    DROP TRIGGER IF EXISTS task_changes_update;
+    CREATE TRIGGER task_changes_update AFTER UPDATE ON tasks BEGIN
+        INSERT INTO task_changes (task_id, operation, data)
+        VALUES (new.id, 'update', json_array(new.id, new.title, new.description, new.category, new.due_date,
+                                             new.priority, new.status, new.due_on, new.priority_rank));
+    END;
+    UPDATE task_changes SET data = json_insert(data, '$[#]',
+        CASE
+            WHEN json_extract(data, '$[4]') GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'
+                THEN substr(json_extract(data, '$[4]'), 7, 4) || '-' || substr(json_extract(data, '$[4]'), 4, 2)
+                     || '-' || substr(json_extract(data, '$[4]'), 1, 2)
+            WHEN json_extract(data, '$[4]') GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+                THEN json_extract(data, '$[4]')
+        END, '$[#]',
+        CASE
+            WHEN json_extract(data, '$[5]') IN ('Высокий', 'высокий', 'ВЫСОКИЙ') THEN 3
+            WHEN json_extract(data, '$[5]') IN ('Средний', 'средний', 'СРЕДНИЙ') THEN 2
+            WHEN json_extract(data, '$[5]') IN ('Низкий', 'низкий', 'НИЗКИЙ') THEN 1
+        END)
+    WHERE data IS NOT NULL AND json_array_length(data) = 7;
+    ''',
+    # 8: сроки без ведущих нулей (5.1.2024) не распознавались столбцом due_on - дополняем их (SQL-функция
+    # normalize_date). В архив такие задачи не попадали: переносятся только задачи с распознанным сроком
+    '''
+    UPDATE tasks SET due_date = normalize_date(due_date)
+    WHERE due_on IS NULL AND normalize_date(due_date) <> due_date;
+    ''',
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+TASK_COLUMNS = 'id, title, description, category, due_date, priority, status'  # Порядок полей Task
+ARCHIVE_COLUMNS = 'id, title, decompress(description), category, due_date, priority, status'
+DONE_STATUSES = ('выполнена',)  # Статусы выполненных задач (без учета регистра)
+PRIORITY_RANKS = {'низкий': 1, 'средний': 2, 'высокий': 3}
+ORDER_BY = {  # Допустимые сортировки search_tasks, каждая обслуживается индексом
+    'id': 't.id',
+    'due_date': 't.due_on, t.priority_rank DESC',
+    'priority': 't.priority_rank DESC, t.due_on',
+}
+
+
+def iso_date(value: str | date) -> str:
+    """Приводит дату (date, ДД.ММ.ГГГГ или ГГГГ-ММ-ДД) к строке ISO, по которой индексирован срок задачи."""
+    if isinstance(value, date):
+        return value.isoformat()
+    for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректная дата: {value}")
+
+
+def normalize_date(value: str) -> str:
+    """Дополняет день и месяц ведущими нулями (5.1.2024 -> 05.01.2024, 2024-1-5 -> 2024-01-05), чтобы срок
+    распознал столбец due_on. Формат даты сохраняется, нераспознанное значение возвращается без изменений."""
+    for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            normalized = datetime.strptime(value, date_format).strftime(date_format)
+        except ValueError:
+            continue
+        return normalized if len(normalized) == 10 else value  # Год из 1-3 цифр strftime не дополняет
+    return value
+
+
+def casefold(value):
+    """Регистронезависимое сравнение строк в SQL (встроенный lower() в SQLite работает только с ASCII)."""
+    return value.casefold() if isinstance(value, str) else value
+
+
+def compress(text: str) -> bytes:
+    """Сжимает текст для хранения в архиве (SQL-функция compress)."""
+    return zlib.compress(text.encode('utf-8'))
+
+
+def decompress(data: bytes) -> str:
+    """Текст из сжатого compress() значения (SQL-функция decompress)."""
+    return zlib.decompress(data).decode('utf-8')
+
+
+def search_sort_key(keyword, order_by):
+    """Ключ сортировки строк _search_rows(keys=True) (id, bm25, срок, ранг приоритета) как ORDER BY в search_tasks,
+    чтобы объединять результаты нескольких таблиц или баз. NULL в SQLite меньше любого значения: пустой срок
+    идет первым, задача без ранга - последней."""
+    if order_by == 'due_date':
+        return lambda row: (row[2] or '', -(row[3] or 0), row[0])
+    if order_by == 'priority':
+        return lambda row: (-(row[3] or 0), row[2] or '', row[0])
+    if keyword and order_by is None:
+        return lambda row: (row[1], row[0])
+    return lambda row: row[0]
+
+
+def sql_statements(script: str) -> Iterator[str]:
+    """Разбивает SQL-скрипт на отдельные запросы (тела триггеров с ';' внутри остаются целыми)."""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+    if statement.strip():
+        yield statement.strip()
+
 
-        result = func(self, *args, **kwargs)  # Вызов оригинальной функции
-        return search_result if func.__name__ == "search_tasks" else result  # Возвращаем результат поиска
+def is_busy(error: sqlite3.Error) -> bool:
+    """База или таблица заблокирована другим соединением (SQLITE_BUSY, SQLITE_LOCKED)."""
+    return isinstance(error, sqlite3.OperationalError) and 'is locked' in str(error)
 
-    return wrapper
+
+def fts_query(keyword: str) -> str | None:
+    """Преобразует ключевое слово в запрос FTS5: каждое слово ищется по префиксу, все слова должны встретиться."""
+    words = re.findall(r'\w+', keyword.casefold())
+    return ' '.join(f'"{word}"*' for word in words) or None
 
 
 class TaskManager:
     """ Класс для управления задачами. """
     logger = getLogger(__name__)
+    _schema_files = set()  # Файлы баз, схема которых уже проверена в этом процессе
+    _schema_lock = threading.Lock()
 
-    def __init__(self, db_name='tasks.db', is_search_db=False):
+    def __init__(self, db_name='tasks.db', synchronous='NORMAL', cache_size=-8000,
+                 cached_statements=256, task_cache_size=0, search_cache_size=0, group_commit=False,
+                 commit_interval_ms=20, commit_batch=1000, verbose=True, stats=False, slow_query_ms=100,
+                 busy_timeout_ms=5000, busy_retries=3, busy_backoff_ms=50, read_only=False, checkpoint_path=None,
+                 checkpoint_interval_s=None):
+        if str(synchronous).upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Недопустимый режим synchronous: {synchronous}")
+        # База в памяти: ':memory:' или URI вида 'file:имя?mode=memory&cache=shared' (общая для менеджеров процесса)
+        db_name = os.fspath(db_name)  # Имя файла, URI или путь (Path)
+        self.memory = db_name == ':memory:' or db_name.startswith('file:') and 'mode=memory' in db_name
+        if self.memory and read_only:
+            raise ValueError("База в памяти не может быть открыта только для чтения")
         self.db_name = db_name
-        self.is_search_db = is_search_db  # Флаг для определения, является ли база поисковой
-        self._create_table()
+        self.verbose = verbose  # Печатать ли сообщения для пользователя (в неинтерактивном режиме отключено)
+        self.synchronous = str(synchronous).upper()  # PRAGMA synchronous для каждого соединения
+        self.cache_size = int(cache_size)  # PRAGMA cache_size: > 0 - в страницах, < 0 - в килобайтах
+        self.cached_statements = cached_statements  # Размер кэша подготовленных запросов на соединение
+        # Несколько процессов с одной базой: сколько SQLite ждет освобождения блокировки, и сколько раз
+        # повторить запрос с экспоненциальной задержкой, если блокировка не освободилась за это время
+        self.busy_timeout = busy_timeout_ms / 1000
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff_ms / 1000
+        # Только чтение: файл открывается в режиме mode=ro, схема не обновляется, записи невозможны
+        self.read_only = read_only
+        # Групповой коммит: записи всех потоков идут в одну общую транзакцию, которая фиксируется раз в
+        # commit_interval_ms или каждые commit_batch операций. Долговечность зафиксированного задает synchronous.
+        self.group_commit = group_commit
+        self.commit_interval = commit_interval_ms / 1000
+        self.commit_batch = commit_batch
+        self._pending = 0  # Сколько операций записи ждут группового коммита
+        self._pending_since = 0.0
+        self._flusher = None
+        self._flusher_stop = threading.Event()
+        # У каждого потока своё соединение, в режиме группового коммита и для базы в памяти - одно общее под
+        # блокировкой (у базы в памяти нет WAL, отдельные соединения потоков только блокировали бы друг друга)
+        shared = group_commit or self.memory
+        self._lock = threading.RLock() if shared else nullcontext()
+        self._local = SimpleNamespace() if shared else threading.local()
+        self._pool_lock = threading.Lock()
+        self._connections = []  # Все открытые соединения пула, чтобы закрыть их в close()
+        self._pool_generation = 0  # Увеличивается при close(), старые соединения потоков становятся недействительными
+        self.task_cache_size = task_cache_size  # Размер LRU-кэша строк задач по ID, 0 - кэш отключен
+        self._task_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = self._cache_misses = 0
+        # Кэш результатов search_tasks по нормализованным параметрам поиска, 0 - кэш отключен. Результат годен,
+        # пока не изменилось поколение данных: счетчик записей этого менеджера и номер последнего изменения
+        # в журнале task_changes (его увеличивает запись из любого соединения и процесса)
+        self.search_cache_size = search_cache_size
+        self._search_cache = OrderedDict()
+        self._search_hits = self._search_misses = 0
+        self._generation = 0
+        self._schema_ready = False  # Схема проверяется при первом соединении, а не при создании менеджера
+        # Статистика запросов (по умолчанию отключена): время, строки, медленные запросы с планами выполнения
+        self.stats = QueryStats(slow_query_ms) if stats else None
+        # Контрольные точки: копия базы в checkpoint_path раз в checkpoint_interval_s секунд (если были изменения)
+        # и при close(). База в памяти при открытии восстанавливается из существующей контрольной точки.
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval_s
+        self._checkpoint_seq = None  # Номер последнего изменения, попавшего в контрольную точку
+        self._checkpointer = None
+        self._checkpointer_stop = threading.Event()
+        setup_logging()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _say(self, *args, **kwargs) -> None:
+        """Печатает сообщение для пользователя, если менеджер создан с verbose=True."""
+        if self.verbose:
+            print(*args, **kwargs)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока из пула. Открывается при первом обращении и далее переиспользуется."""
+        local = self._local
+        if getattr(local, 'generation', None) != self._pool_generation:
+            with self._lock:  # Общее соединение открывает только один поток
+                if getattr(local, 'generation', None) != self._pool_generation:
+                    local.connection = self._connect()
+                    local.generation = self._pool_generation
+                    if not self._schema_ready:
+                        self._ensure_schema()
+        return local.connection
+
+    def _ensure_schema(self) -> None:
+        """Применяет миграции схемы один раз на файл базы за время работы процесса."""
+        if self.read_only:  # Читатель не может обновить схему, только проверяет ее версию
+            version = self.execute_query('PRAGMA user_version')[0]
+            if version < SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"Версия схемы базы {self.db_name} ({version}) ниже {SCHEMA_VERSION}, "
+                                            f"откройте ее без read_only для обновления")
+            self._schema_ready = True
+            return
+        if self.memory:  # База в памяти пуста при каждом открытии, схема создается заново
+            if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+                self.restore(self.checkpoint_path)
+                self._checkpoint_seq = self.last_change_seq()  # Контрольная точка совпадает с базой
+            else:
+                self._create_table()
+            self._schema_ready = True
+            self._start_checkpointer()
+            return
+        key = os.path.abspath(self.db_name)
+        with self._schema_lock:
+            # Файл могли удалить или заменить после проверки, поэтому версия схемы сверяется и для известного файла
+            if key not in self._schema_files or self.execute_query('PRAGMA user_version')[0] < SCHEMA_VERSION:
+                self._create_table()
+                self._schema_files.add(key)
+        self._schema_ready = True
+        self._start_checkpointer()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает новое соединение и настраивает его PRAGMA."""
+        if self.read_only:  # URI mode=ro: соединение не берет блокировку записи и не может изменить файл
+            connection = sqlite3.connect(f'{Path(self.db_name).resolve().as_uri()}?mode=ro', uri=True,
+                                         timeout=self.busy_timeout, check_same_thread=False,
+                                         cached_statements=self.cached_statements)
+        else:
+            # Записи начинают транзакцию с BEGIN IMMEDIATE: блокировка записи берется сразу, а не при первом
+            # изменении, поэтому два процесса не ждут друг друга до истечения таймаута с ошибкой "database is locked"
+            connection = sqlite3.connect(self.db_name, timeout=self.busy_timeout, isolation_level='IMMEDIATE',
+                                         check_same_thread=False, cached_statements=self.cached_statements,
+                                         uri=self.db_name.startswith('file:'))
+            if not self.memory:
+                connection.execute('PRAGMA journal_mode=WAL')  # Читатели не блокируют писателя
+        connection.execute(f'PRAGMA synchronous={self.synchronous}')
+        connection.execute(f'PRAGMA cache_size={self.cache_size}')
+        connection.create_function('casefold', 1, casefold, deterministic=True)
+        connection.create_function('normalize_date', 1, normalize_date, deterministic=True)
+        connection.create_function('compress', 1, compress, deterministic=True)
+        connection.create_function('decompress', 1, decompress, deterministic=True)
+        with self._pool_lock:
+            self._connections.append(connection)
+        if self.stats is not None:
+            self.stats.connection_opened()
+        self.logger.debug("Открыто соединение с %s", self.db_name)
+        return connection
+
+    def close(self) -> None:
+        """Закрывает все соединения пула. При следующем запросе соединение будет открыто заново.
+
+        Содержимое базы в памяти при закрытии теряется, сохраняется только контрольная точка (checkpoint_path).
+        """
+        if self._flusher is not None:
+            self._flusher_stop.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._checkpointer is not None:
+            self._checkpointer_stop.set()
+            self._checkpointer.join()
+            self._checkpointer = None
+        if self.checkpoint_path and self._connections:
+            self.checkpoint()
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+            self._pool_generation += 1
+        if self.memory:
+            self._schema_ready = False
+            self._checkpoint_seq = None
+        for connection in connections:
+            connection.close()
+
+    def snapshot(self, path) -> None:
+        """Сохраняет согласованную копию базы в файл через backup API SQLite.
+
+        Копия пишется во временный файл и заменяет path целиком, поэтому прерванный снимок не портит предыдущий.
+        """
+        self.flush()
+        path = Path(path)
+        temporary = path.with_name(path.name + '.tmp')
+        with self._lock:
+            if self._transaction_depth():
+                raise RuntimeError("Снимок базы нельзя сделать внутри transaction()")
+            connection = self.connection
+            target = sqlite3.connect(temporary)
+            try:
+                connection.backup(target)
+            finally:
+                target.close()
+        os.replace(temporary, path)
+        self.logger.debug("Снимок базы %s сохранен в %s", self.db_name, path)
+
+    def restore(self, path) -> None:
+        """Заменяет содержимое базы копией из файла (снимком или обычной базой задач) и обновляет ее схему."""
+        path = Path(path)
+        if not path.exists():  # sqlite3.connect создал бы пустой файл
+            raise FileNotFoundError(f"Нет файла снимка: {path}")
+        self.flush()
+        with self._lock:
+            if self._transaction_depth():
+                raise RuntimeError("Базу нельзя восстановить внутри transaction()")
+            connection = self.connection
+            source = sqlite3.connect(f'{path.resolve().as_uri()}?mode=ro', uri=True)
+            try:
+                source.backup(connection)
+            finally:
+                source.close()
+            self._invalidate()
+            self._create_table()  # Снимок мог быть сделан с более старой схемой
+        self.logger.debug("База %s восстановлена из %s", self.db_name, path)
+
+    def checkpoint(self) -> bool:
+        """Сохраняет контрольную точку в checkpoint_path, если после предыдущей были изменения."""
+        seq = self.last_change_seq()
+        if seq == self._checkpoint_seq:
+            return False
+        self.snapshot(self.checkpoint_path)
+        self._checkpoint_seq = seq
+        return True
+
+    def _start_checkpointer(self) -> None:
+        """Запускает фоновый поток контрольных точек, если задан интервал."""
+        if self.checkpoint_path and self.checkpoint_interval and self._checkpointer is None:
+            self._checkpointer_stop.clear()
+            self._checkpointer = threading.Thread(target=self._checkpoint_loop, name='task-manager-checkpoint',
+                                                  daemon=True)
+            self._checkpointer.start()
+
+    def _checkpoint_loop(self) -> None:
+        """Фоновый поток: сохраняет контрольную точку раз в checkpoint_interval_s секунд."""
+        while not self._checkpointer_stop.wait(self.checkpoint_interval):
+            try:
+                self.checkpoint()
+            except (sqlite3.Error, OSError, RuntimeError) as error:
+                self.logger.error("Не удалось сохранить контрольную точку %s: %s", self.checkpoint_path, error)
 
     def execute_query(self, query, params=(), commit=False, one_line=True) -> int | list[str]:
         """Упрощает выполнение запросов к базе данных."""
-        with sqlite3.connect(self.db_name) as connection:  # Подключение к базе данных
-            cursor = connection.cursor()  # Создание курсора
-            cursor.execute(query, params)  # Выполнение запроса
-            if commit:  # Если нужно выполнить коммит
-                connection.commit()  # Выполнение изменений в базе данных
-                task_id = cursor.lastrowid
-                return task_id
+        for attempt in count():
+            try:
+                return self._execute(query, params, commit, one_line)
+            except sqlite3.OperationalError as error:
+                if not self._retry_busy(error, attempt):
+                    raise
+
+    def _retry_busy(self, error: sqlite3.OperationalError, attempt: int) -> bool:
+        """Решает, повторить ли запрос, не выполненный из-за блокировки базы другим процессом, и ждет перед
+        повтором с экспоненциально растущей задержкой. Внутри transaction() и группового коммита не повторяет:
+        откатилась бы вся транзакция, а не один запрос."""
+        if not is_busy(error) or attempt >= self.busy_retries or self.group_commit or self._transaction_depth():
+            return False
+        delay = self.busy_backoff * 2 ** attempt * random.uniform(1, 2)  # Случайность разводит процессы по времени
+        self.logger.warning("База %s заблокирована (%s), повтор %s через %.0f мс",
+                            self.db_name, error, attempt + 1, delay * 1000)
+        time.sleep(delay)
+        return True
+
+    def _execute(self, query, params, commit, one_line) -> int | list[str]:
+        """Выполняет запрос в соединении текущего потока и коммитит, если запрос не внутри transaction()."""
+        with self._lock:
+            connection = self.connection  # Соединение текущего потока из пула
+            in_batch = self._transaction_depth() > 0  # Внутри transaction() коммит выполняется в конце блока
+            try:
+                started, changes = time.perf_counter(), connection.total_changes
+                cursor = connection.execute(query, params)  # Выполнение запроса (подготовленное выражение из кэша)
+                if commit:  # Если нужно выполнить коммит
+                    result, rows = cursor.lastrowid, cursor.rowcount
+                else:
+                    result = cursor.fetchone() if one_line else cursor.fetchall()  # Результат запроса
+                    rows = len(result) if not one_line else int(result is not None)  # Прочитано строк
+                if self.stats is not None:
+                    self._record(connection, query, params, time.perf_counter() - started, changes,
+                                 max(cursor.rowcount, rows))  # Для изменений - число измененных строк
+                # Изменения без commit=True тоже фиксируются. При групповом коммите транзакция открыта, пока копится
+                # группа, поэтому операцией считается только запрос, изменивший строки: чтения порог не приближают
+                wrote = connection.total_changes != changes if self.group_commit else connection.in_transaction
+                if (commit or wrote) and not in_batch:
+                    self._commit(connection)  # Выполнение изменений в базе данных
+                return result
+            except sqlite3.Error:
+                # При групповом коммите SQLite сам отменяет только сбойный запрос, чужие записи группы остаются
+                if connection.in_transaction and not in_batch and not self.group_commit:
+                    connection.rollback()
+                raise
+
+    def _record(self, connection: sqlite3.Connection, query: str, params, seconds: float, changes: int,
+                rows: int) -> None:
+        """Учитывает выполненный запрос в статистике. Медленные запросы записываются вместе с планом выполнения.
+
+        changes - connection.total_changes до запроса: все, что изменено сверх строк самого запроса, записали триггеры.
+        """
+        written = connection.total_changes - changes
+        self.stats.record(query, seconds, rows, written - rows if written else 0)
+        if self.stats.is_slow(seconds):
+            try:  # EXPLAIN QUERY PLAN не выполняет сам запрос
+                plan = [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+            except sqlite3.Error:
+                plan = []
+            self.stats.record_slow(query, seconds, plan)
+
+    def _commit_now(self, connection: sqlite3.Connection) -> None:
+        """Коммит транзакции соединения, его время учитывается в статистике как запрос COMMIT."""
+        started = time.perf_counter()
+        connection.commit()
+        if self.stats is not None:
+            self.stats.record('COMMIT', time.perf_counter() - started)
+
+    def metrics(self) -> dict:
+        """Снимок метрик менеджера для экспорта: кэши задач и поиска и, если включена, статистика запросов."""
+        snapshot = {name: {**info._asdict(), 'hit_ratio': round(info.hit_ratio, 4)}
+                    for name, info in (('cache', self.cache_info()), ('search_cache', self.search_cache_info()))}
+        if self.stats is not None:
+            snapshot.update(self.stats.snapshot())
+        return snapshot
+
+    def _commit(self, connection: sqlite3.Connection) -> None:
+        """Фиксирует изменения. При групповом коммите только учитывает запись и коммитит по порогам."""
+        if not self.group_commit:
+            self._commit_now(connection)
+            return
+        if not self._pending:
+            self._pending_since = time.monotonic()
+            if self._flusher is None:  # Фоновый поток коммитит группу, если новых записей долго нет
+                self._flusher_stop.clear()
+                self._flusher = threading.Thread(target=self._flush_loop, name='task-manager-flusher', daemon=True)
+                self._flusher.start()
+        self._pending += 1
+        if self._pending >= self.commit_batch or time.monotonic() - self._pending_since >= self.commit_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Немедленно фиксирует накопленные групповым коммитом записи."""
+        if not self.group_commit:
+            return
+        with self._lock:
+            connection = getattr(self._local, 'connection', None)
+            if self._pending and connection is not None and self._local.generation == self._pool_generation:
+                if connection.in_transaction:
+                    self._commit_now(connection)
+                self.logger.debug("Групповой коммит %s операций", self._pending)
+            self._pending = 0
+
+    def _flush_loop(self) -> None:
+        """Фоновый поток группового коммита: фиксирует записи, ожидающие дольше commit_interval_ms."""
+        while not self._flusher_stop.wait(self.commit_interval):
+            with self._lock:
+                if self._pending and time.monotonic() - self._pending_since >= self.commit_interval:
+                    self.flush()
+
+    def _transaction_depth(self) -> int:
+        """Глубина вложенности transaction() в текущем потоке для текущего соединения."""
+        local = self._local
+        return local.depth if getattr(local, 'depth_generation', None) == self._pool_generation else 0
+
+    @contextmanager
+    def transaction(self):
+        """Объединяет запросы блока в одну транзакцию текущего потока: коммит в конце, откат при ошибке.
+
+        Вложенные блоки присоединяются к внешнему, методы менеджера внутри блока не коммитят сами.
+        При групповом коммите блок выполняется в точке сохранения общей транзакции и откатывается только он.
+        """
+        with self._lock:
+            connection = self.connection
+            local = self._local
+            depth = self._transaction_depth()
+            savepoint = self.group_commit and depth == 0
+            if savepoint:
+                if not connection.in_transaction:
+                    connection.execute('BEGIN IMMEDIATE')
+                connection.execute('SAVEPOINT task_manager_block')
+            if depth == 0:
+                local.touched = set()  # ID задач, измененных в блоке (None - весь кэш), см. _invalidate
+            local.depth, local.depth_generation = depth + 1, self._pool_generation
+            try:
+                yield connection
+            except BaseException:
+                local.depth = depth
+                if savepoint:
+                    connection.execute('ROLLBACK TO task_manager_block')
+                    connection.execute('RELEASE task_manager_block')
+                    self._invalidate()
+                elif depth == 0 and connection.in_transaction:
+                    connection.rollback()
+                    self._invalidate()  # В кэш могли попасть незафиксированные строки
+                raise
+            else:
+                local.depth = depth
+                if savepoint:
+                    connection.execute('RELEASE task_manager_block')
+                if depth == 0 and connection.in_transaction:
+                    self._commit(connection)
+            finally:
+                if depth == 0:  # Читатели других потоков до коммита видели и могли закэшировать старые строки
+                    touched, local.touched = local.touched, set()
+                    for task_id in ({None} if None in touched else touched):
+                        self._invalidate(task_id)
+
+    def _cache_get(self, task_id: int) -> tuple | None:
+        """Строка задачи из LRU-кэша или None. Учитывает попадания и промахи."""
+        if not self.task_cache_size:
+            return None
+        with self._cache_lock:
+            row = self._task_cache.get(task_id)
+            if row is None:
+                self._cache_misses += 1
+                return None
+            self._task_cache.move_to_end(task_id)
+            self._cache_hits += 1
+            return row
+
+    def _cache_put(self, rows: Iterable[tuple], generation: int) -> None:
+        """Кладет строки задач в LRU-кэш, вытесняя давно не использованные.
+
+        generation - значение _generation до чтения строк: если с тех пор была запись, строки могли устареть
+        и в кэш не попадают.
+        """
+        if not self.task_cache_size:
+            return
+        with self._cache_lock:
+            if generation != self._generation:
+                return
+            for row in rows:
+                self._task_cache[row[0]] = row
+                self._task_cache.move_to_end(row[0])
+            while len(self._task_cache) > self.task_cache_size:
+                self._task_cache.popitem(last=False)
+
+    def _invalidate(self, task_id: int | None = None) -> None:
+        """Сбрасывает задачу из кэша после записи, без ID - весь кэш. Сохраненные результаты поиска устаревают.
+
+        Внутри transaction() задача сбрасывается еще раз после коммита или отката блока.
+        """
+        with self._cache_lock:
+            self._generation += 1
+            if task_id is None:
+                self._task_cache.clear()
             else:
-                return cursor.fetchone() if one_line else cursor.fetchall()  # Возврат результата
+                self._task_cache.pop(task_id, None)
+        if self._transaction_depth():
+            self._local.touched.add(task_id)
+
+    def cache_info(self) -> CacheInfo:
+        """Статистика LRU-кэша задач: попадания, промахи, максимальный и текущий размер."""
+        with self._cache_lock:
+            return CacheInfo(self._cache_hits, self._cache_misses, self.task_cache_size, len(self._task_cache))
+
+    def search_cache_info(self) -> CacheInfo:
+        """Статистика кэша результатов поиска, доля попаданий - hit_ratio."""
+        with self._cache_lock:
+            return CacheInfo(self._search_hits, self._search_misses, self.search_cache_size, len(self._search_cache))
 
-    def get_task(self, task_id: int | list[int] | None = None) -> Task | None:
-        """Получает одну или несколько задач из базы данных по заданным ID или все задачи, если ID не указаны."""
+    def _data_generation(self) -> tuple[int, int]:
+        """Поколение данных: меняется после любой записи этого менеджера или любого другого соединения."""
+        return self._generation, self.last_change_seq()
+
+    def get_task(self, task_id: int | list[int] | None = None, include_archive: bool = False) -> Task | None:
+        """Получает одну или несколько задач из базы данных по заданным ID или все задачи, если ID не указаны.
+
+        С include_archive=True задачи ищутся также в архиве (см. archive).
+        """
         if task_id is None:  # Возвращаем все задачи.
-            tasks = self.execute_query('SELECT * FROM tasks', one_line=False)
-            return [Task(*row) for row in tasks]
-        elif isinstance(task_id, list):  # Возвращаем задачи для списка ID.
-            result_tasks = []
-            for e in task_id:
-                task_row = self.execute_query('SELECT * FROM tasks WHERE id = ?', (e,))
-                if task_row:
-                    result_tasks.append(Task(*task_row))
-            return result_tasks
+            return list(self.iter_tasks(include_archive=include_archive))
+        elif isinstance(task_id, list):  # Возвращаем задачи для списка ID пакетами запросов IN (...).
+            return list(self.iter_tasks(task_id, include_archive=include_archive))
         else:  # Возвращаем задачу для одного ID.
-            task_row = self.execute_query('SELECT * FROM tasks WHERE id = ?', (task_id,))
-            if not task_row:
-                print(f'Задача с ID {task_id} не найдена')
-                return None
+            task_row = self._cache_get(task_id)
+            if task_row is None:
+                generation = self._generation
+                task_row = self.execute_query(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?', (task_id,))
+                if not task_row and include_archive:  # Архивные задачи не кэшируются
+                    task_row = self.execute_query(f'SELECT {ARCHIVE_COLUMNS} FROM tasks_archive WHERE id = ?',
+                                                  (task_id,))
+                    if task_row:
+                        return Task(*task_row)
+                if not task_row:
+                    self._say(f'Задача с ID {task_id} не найдена')
+                    return None
+                self._cache_put((task_row,), generation)
             return Task(*task_row)
 
-    @sync_with_search_db
+    def iter_tasks(self, task_ids: Iterable[int] | None = None, chunk_size: int = CHUNK_SIZE, after_id: int = None,
+                   limit: int = None, offset: int = 0, include_archive: bool = False) -> Iterator[Task]:
+        """Потоково выдает задачи в порядке переданных ID (или все задачи по возрастанию ID), не держа их в памяти.
+
+        Для всех задач поддерживается постраничный вывод: after_id (по ключу, без пропуска строк) и limit/offset.
+        С include_archive=True выдаются также задачи из архива.
+        """
+        if task_ids is None:
+            if not include_archive:
+                yield from self._iter_table(TASK_COLUMNS, 'tasks', chunk_size, after_id, limit, offset)
+                return
+            window = None if limit is None else limit + offset  # Страница целиком может оказаться в одной таблице
+            merged = heapq.merge(self._iter_table(TASK_COLUMNS, 'tasks', chunk_size, after_id, window),
+                                 self._iter_table(ARCHIVE_COLUMNS, 'tasks_archive', chunk_size, after_id, window),
+                                 key=attrgetter('task_id'))
+            yield from islice(merged, offset, None if limit is None else offset + limit)
+            return
+        task_ids = iter(task_ids)
+        while chunk := list(islice(task_ids, chunk_size)):
+            found = {e: row for e in chunk if (row := self._cache_get(e)) is not None}
+            missing = [e for e in chunk if e not in found]
+            if missing:
+                generation = self._generation
+                rows = self._select_ids(f'SELECT {TASK_COLUMNS} FROM tasks', missing)
+                self._cache_put(rows, generation)
+                found.update((row[0], row) for row in rows)
+                if include_archive and (missing := [e for e in missing if e not in found]):
+                    found.update((row[0], row) for row in
+                                 self._select_ids(f'SELECT {ARCHIVE_COLUMNS} FROM tasks_archive', missing))
+            yield from (Task(*found[e]) for e in chunk if e in found)  # Порядок как у вызывающего, без пропавших ID
+
+    def _iter_table(self, columns: str, table: str, chunk_size: int, after_id: int | None, limit: int | None,
+                    offset: int = 0) -> Iterator[Task]:
+        """Потоково выдает задачи таблицы по возрастанию ID, читая курсор порциями по chunk_size строк."""
+        connection = self.connection
+        query, params = f'SELECT {columns} FROM {table}', []
+        if after_id is not None:  # Пагинация по ключу: следующая страница начинается сразу после after_id
+            query += ' WHERE id > ?'
+            params.append(after_id)
+        query += ' ORDER BY id' + self._page(params, limit, offset)
+        started, changes = time.perf_counter(), connection.total_changes
+        cursor = connection.execute(query, params)
+        count = 0
+        elapsed = 0.0  # Время выполнения и чтения порций, без времени обработки задач вызывающим
+        try:
+            while rows := cursor.fetchmany(chunk_size):
+                elapsed += time.perf_counter() - started
+                count += len(rows)
+                yield from (Task(*row) for row in rows)
+                started = time.perf_counter()
+            elapsed += time.perf_counter() - started
+        finally:
+            if self.stats is not None:
+                self._record(connection, query, params, elapsed, changes, count)
+
+    def _select_ids(self, select: str, ids: list[int]) -> list[tuple]:
+        """Строки запроса select (SELECT ... FROM таблица) для списка ID одним запросом IN (...)."""
+        connection = self.connection
+        query = f'{select} WHERE id IN ({", ".join("?" * len(ids))})'
+        started, changes = time.perf_counter(), connection.total_changes
+        rows = connection.execute(query, ids).fetchall()
+        if self.stats is not None:
+            self._record(connection, query, ids, time.perf_counter() - started, changes, len(rows))
+        return rows
+
     def update_task(self, task_id: int, **kwargs) -> Task:
         """Обновляет задачу в базе данных на основе переданных ключевых слов аргументов."""
         task = self.get_task(task_id)
         if not task:
             self.logger.error("Введён id несуществующей задачи")
             return "Task not found"
+        if 'due_date' in kwargs:
+            kwargs['due_date'] = normalize_date(kwargs['due_date'])
         # Формируем части SQL-запроса для обновления и значения параметров
         sql_sets = ", ".join([f"{key} = ?" for key in kwargs.keys()])
         values = list(kwargs.values())
         values.append(task_id)
         # Выполнение запроса обновления
         self.execute_query(f"UPDATE tasks SET {sql_sets} WHERE id = ?", values)
-        self.logger.debug(f"Изменена задача с id {task_id}")
+        self._invalidate(task_id)
+        self.logger.debug("Изменена задача с id %s", task_id)
         return self.get_task(task_id)  # Возвращаем обновленное состояние задачи
 
-    @sync_with_search_db
     def add_task(self, task: Task) -> int:
         """Добавляет новую задачу в базу данных и возвращает задачу с присвоенным ID."""
-        query = '''INSERT INTO tasks (title, description, category, due_date, priority, status)
-                   VALUES (?, ?, ?, ?, ?, ?)'''
-        params = (task.title, task.description, task.category, task.due_date, task.priority, task.status)
-        task_id = self.execute_query(query, params, commit=True)
-        self.logger.debug(f"Добавлена задача с id {task_id}")
+        params = (task.title, task.description, task.category, normalize_date(task.due_date), task.priority,
+                  task.status)
+        task_id = self.execute_query(INSERT_TASK, params, commit=True)
+        self._invalidate(task_id)
+        self.logger.debug("Добавлена задача с id %s", task_id)
         return task_id
 
-    @sync_with_search_db
-    def search_tasks(self, keyword=None, category=None, status=None) -> list[int] | str:
-        """Поиск задач в поисковой базе данных."""
-        if self.db_name == "search_tasks.db":
-            query_parts = []  # Список частей запроса
-            params = []  # Список параметров
-            if keyword:  # Если задано ключевое слово
-                keyword_pattern = f'%{keyword.lower()}%'  # Создание паттерна для поиска
-                query_parts.append('(title LIKE ? OR description LIKE ? OR category LIKE ? OR status LIKE ?)')
-                params.extend([keyword_pattern] * 4)  # Добавление pattern для каждого поля
-            if category:  # Если задана категория
-                query_parts.append('category = ?')  # Добавление части запроса
-                params.append(category.lower())  # Добавление параметра в нижнем регистре
-            if status:  # Если задан статус
-                query_parts.append('status = ?')  # Добавление части запроса
-                params.append(status.lower())  # Добавление параметра в нижнем регистре
-            query = 'SELECT id FROM tasks'
-            if query_parts:  # Если есть части запроса
-                query += ' WHERE ' + ' AND '.join(query_parts)  # Добавление части запроса
-            result_rows = self.execute_query(query, params,
-                                             one_line=False)  # Вызов метода execute_query для выполнения запроса
-            print("-" * 60, f"найдено  задач: {len(result_rows)}", "-" * 60, sep="\n")
-            res = [row[0] for row in result_rows]
-            self.logger.debug(f"Были найдены задачи с id '{res}',"
-                              f" поиск: keyword:'{keyword}', category:'{category}' ,status:'{status}'")
-            return res  # Возврат списка ID наеденных задач
+    def bulk_add(self, tasks: Iterable[Task], batch_size: int = 1000, progress=None) -> int:
+        """Добавляет задачи пакетами: один executemany и одна транзакция на пакет. Возвращает число задач."""
+        connection = self.connection
+        tasks = iter(tasks)
+        added = 0
+        while batch := list(islice(tasks, batch_size)):
+            params = [(task.title, task.description, task.category, normalize_date(task.due_date), task.priority,
+                       task.status) for task in batch]
+            for attempt in count():  # Откатившийся из-за блокировки базы пакет повторяется целиком
+                try:
+                    with self.transaction():  # Коммит пакета целиком или откат при ошибке
+                        started, changes = time.perf_counter(), connection.total_changes
+                        connection.executemany(INSERT_TASK, params)
+                        if self.stats is not None:
+                            self._record(connection, INSERT_TASK, params[0], time.perf_counter() - started, changes,
+                                         len(params))
+                    break
+                except sqlite3.OperationalError as error:
+                    if not self._retry_busy(error, attempt):
+                        raise
+            added += len(batch)
+            with self._cache_lock:
+                self._generation += 1  # Новые задачи меняют результаты поиска
+            if progress:  # Сообщаем вызывающему, сколько задач уже добавлено
+                progress(added)
+        self.logger.debug("Пакетно добавлено задач: %s", added)
+        return added
+
+    def _matching_values(self, table: str, column: str, folded: Iterable[str]) -> list[str]:
+        """Различные значения столбца category или status таблицы, совпадающие с folded без учета регистра
+        (встроенный lower() в SQLite работает только с ASCII, поэтому сравнение выполняется в Python).
+
+        Для tasks значения берутся из сводной таблицы task_stats, для архива - перебором по индексу столбца:
+        один поиск на каждое различное значение, а не просмотр всех строк.
+        """
+        if table == 'tasks':
+            rows = self.execute_query('SELECT value FROM task_stats WHERE dimension = ?', (column,), one_line=False)
         else:
-            return "Вы не находитесь в поисковой базе данных"
+            rows = self.execute_query(
+                f'WITH RECURSIVE distinct_values(value) AS (SELECT MIN({column}) FROM {table} '
+                f'UNION ALL SELECT (SELECT MIN({column}) FROM {table} WHERE {column} > value) '
+                f'FROM distinct_values WHERE value IS NOT NULL) '
+                f'SELECT value FROM distinct_values WHERE value IS NOT NULL', one_line=False)
+        folded = set(folded)
+        return [value for value, in rows if value.casefold() in folded]
+
+    def _filters(self, category=None, status=None, priority=None, due_from=None, due_to=None,
+                 table='tasks') -> tuple[list[str], list]:
+        """Условия WHERE (по таблице table с псевдонимом t) и их параметры. Каждое условие обслуживается индексом."""
+        query_parts = []  # Список частей запроса
+        params = []  # Список параметров
+        # Категории и статусы без учета регистра (включая кириллицу): сначала находятся подходящие значения,
+        # затем строки выбираются равенством по индексу idx_tasks_category или idx_tasks_status
+        for column, value in (('category', category), ('status', status)):
+            if value:
+                matches = self._matching_values(table, column, (value.casefold(),))
+                query_parts.append(f't.{column} IN ({", ".join("?" * len(matches))})')  # IN () - ни одной строки
+                params.extend(matches)
+        if priority:
+            rank = PRIORITY_RANKS.get(priority.casefold())
+            if rank is None:
+                raise ValueError(f"Неизвестный приоритет: {priority}")
+            query_parts.append('t.priority_rank = ?')
+            params.append(rank)
+        if due_from:  # Диапазон сроков по индексу idx_tasks_due_on, границы включаются
+            query_parts.append('t.due_on >= ?')
+            params.append(iso_date(due_from))
+        if due_to:
+            query_parts.append('t.due_on <= ?')
+            params.append(iso_date(due_to))
+        return query_parts, params
+
+    @staticmethod
+    def _page(params: list, limit: int | None, offset: int) -> str:
+        """Часть запроса LIMIT/OFFSET для постраничного вывода, параметры добавляются в params."""
+        if limit is None and not offset:
+            return ''
+        params.extend((-1 if limit is None else limit, offset))  # LIMIT -1 в SQLite - без ограничения
+        return ' LIMIT ? OFFSET ?'
+
+    def search_tasks(self, keyword=None, category=None, status=None, priority=None, due_from=None, due_to=None,
+                     order_by=None, after_id=None, limit=None, offset=0, include_archive=False) -> list[int]:
+        """Поиск задач. Ключевое слово ищется по полнотекстовому индексу, результаты упорядочены по релевантности.
+
+        Фильтры по приоритету и диапазону сроков, а также сортировка order_by ('id', 'due_date', 'priority')
+        выполняются по индексам таблицы tasks. after_id, limit и offset задают страницу результатов.
+        С include_archive=True поиск идет также по архиву, релевантность в двух индексах сравнима приблизительно.
+        """
+        arguments = (keyword, category, status, priority, due_from, due_to, order_by, after_id, limit, offset)
+        # Поколение читается до запроса: запись другого соединения во время поиска не получит устаревший результат
+        generation = self._data_generation() if self.search_cache_size else None
+        res = self._search_cached((*arguments, include_archive), generation)
+        if res is None:
+            if include_archive:  # Первые страницы задач и архива с ключами сортировки, общая страница - после слияния
+                window = (*arguments[:8], None if limit is None else limit + offset, 0)
+                rows = self._search_rows(*window, keys=True) + self._search_rows(*window, keys=True, archive=True)
+                rows.sort(key=search_sort_key(keyword, order_by))
+                res = [row[0] for row in rows[offset:None if limit is None else offset + limit]]
+            else:
+                res = [row[0] for row in self._search_rows(*arguments)]
+            self._search_store((*arguments, include_archive), res, generation)
+        self._say("-" * 60, f"найдено  задач: {len(res)}", "-" * 60, sep="\n")
+        self.logger.debug("Были найдены задачи с id '%s', поиск: keyword:'%s', category:'%s' ,status:'%s',"
+                          " priority:'%s', due:'%s'-'%s'", res, keyword, category, status, priority, due_from, due_to)
+        return res  # Возврат списка ID наеденных задач
+
+    @staticmethod
+    def _search_key(keyword, category, status, priority, due_from, due_to, order_by, after_id, limit, offset,
+                    include_archive) -> tuple:
+        """Нормализованные параметры поиска: запросы, отличающиеся только регистром или форматом даты, совпадают."""
+        return (fts_query(keyword) if keyword else None, casefold(category or None), casefold(status or None),
+                casefold(priority or None), iso_date(due_from) if due_from else None,
+                iso_date(due_to) if due_to else None, order_by, after_id, limit, offset, bool(include_archive))
+
+    def _search_cached(self, arguments: tuple, generation: tuple[int, int]) -> list[int] | None:
+        """Результат поиска из кэша, если он получен в поколении данных generation, иначе None."""
+        if not self.search_cache_size:
+            return None
+        key = self._search_key(*arguments)
+        with self._cache_lock:
+            entry = self._search_cache.get(key)
+            if entry is None or entry[0] != generation:
+                self._search_misses += 1
+                return None
+            self._search_cache.move_to_end(key)
+            self._search_hits += 1
+            return list(entry[1])  # Копия: вызывающий может изменять свой список
+
+    def _search_store(self, arguments: tuple, result: list[int], generation: tuple[int, int]) -> None:
+        """Сохраняет результат поиска с поколением данных, прочитанным до запроса (как _cache_put).
+        Внутри transaction() не сохраняет: данные могут быть откатаны."""
+        if not self.search_cache_size or self._transaction_depth():
+            return
+        key = self._search_key(*arguments)
+        with self._cache_lock:
+            self._search_cache[key] = (generation, list(result))
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self.search_cache_size:
+                self._search_cache.popitem(last=False)
+
+    def _search_rows(self, keyword=None, category=None, status=None, priority=None, due_from=None, due_to=None,
+                     order_by=None, after_id=None, limit=None, offset=0, keys=False, archive=False) -> list[tuple]:
+        """Строки результата search_tasks: (id,), а с keys=True - (id, релевантность bm25 или None, срок ISO,
+        ранг приоритета). Ключи сортировки нужны, чтобы объединять результаты архива и нескольких баз
+        (см. search_sort_key). С archive=True поиск идет по архиву вместо tasks.
+        """
+        if order_by is not None and order_by not in ORDER_BY:
+            raise ValueError(f"Неизвестная сортировка: {order_by}, доступны: {', '.join(ORDER_BY)}")
+        table, fts = ('tasks_archive', 'tasks_archive_fts') if archive else ('tasks', 'tasks_fts')
+        query_parts, params = self._filters(category, status, priority, due_from, due_to, table)
+        if after_id is not None:
+            query_parts.append('t.id > ?')
+            params.append(after_id)
+        match = fts_query(keyword) if keyword else None
+        if keyword and not match:  # В ключевом слове нет ни одного слова для поиска
+            return []
+        if match:  # Если задано ключевое слово, ищем по полнотекстовому индексу
+            columns = f't.id, {fts}.rank, t.due_on, t.priority_rank' if keys else 't.id'
+            query = f'SELECT {columns} FROM {fts} JOIN {table} t ON t.id = {fts}.rowid'
+            query_parts.insert(0, f'{fts} MATCH ?')
+            params.insert(0, match)
+            order = ORDER_BY[order_by] if order_by else f'{fts}.rank'  # bm25: сначала наиболее релевантные
+        else:
+            columns = 't.id, NULL, t.due_on, t.priority_rank' if keys else 't.id'
+            query = f'SELECT {columns} FROM {table} t'
+            order = ORDER_BY[order_by or 'id']
+        if query_parts:  # Если есть части запроса
+            query += ' WHERE ' + ' AND '.join(query_parts)  # Добавление части запроса
+        query += f' ORDER BY {order}' + self._page(params, limit, offset)
+        return self.execute_query(query, params, one_line=False)
+
+    def categories(self) -> list[str]:
+        """Список различных категорий задач (из сводной таблицы, без просмотра задач)."""
+        return list(self.summary()['category'])
+
+    def summary(self) -> dict[str, dict[str, int]]:
+        """Число задач по категориям, статусам и приоритетам: {'category': {'Работа': 12, ...}, ...}.
+
+        Читается из таблицы task_stats, которую триггеры обновляют при каждом изменении задач.
+        """
+        rows = self.execute_query('SELECT dimension, value, count FROM task_stats ORDER BY dimension, value',
+                                  one_line=False)
+        result = {'category': {}, 'status': {}, 'priority': {}}
+        for dimension, value, number in rows:
+            result[dimension][value] = number
+        return result
 
-    @sync_with_search_db
     def delete_task(self, task_id: int) -> None | int:
         """Удаляет задачу из базы данных по-заданному ID."""
         name_query = 'SELECT title FROM tasks WHERE id = ?'  # Получить имя задачи для печати информации
@@ -136,29 +1104,132 @@ class TaskManager:
         task_name = name[0] if name else None  # Если задача существует, то получить имя задачи
         delete_query = 'DELETE FROM tasks WHERE id = ?'
         self.execute_query(delete_query, (task_id,), commit=True)  # Выполнить запрос на удаление задачи
-        if self.db_name == "tasks.db":
-            if task_name:  # Если задача существует
-                print(f'Задача "{task_name}" с ID {task_id} удалена')  # Вывести информацию о результате
-                self.logger.debug(f'Задача "{task_name}" с ID {task_id} удалена')
-                return task_id
+        self._invalidate(task_id)
+        if task_name:  # Если задача существует
+            self._say(f'Задача "{task_name}" с ID {task_id} удалена')  # Вывести информацию о результате
+            self.logger.debug('Задача "%s" с ID %s удалена', task_name, task_id)
+            return task_id
+
+    def delete_where(self, category=None, status=None, before_date=None) -> int:
+        """Удаляет одним запросом задачи по фильтрам (срок строго раньше before_date). Возвращает число удаленных."""
+        query_parts, params = self._filters(category, status)
+        if before_date:
+            query_parts.append('t.due_on < ?')
+            params.append(iso_date(before_date))
+        if not query_parts:  # Для удаления всех задач есть cleanup_database
+            raise ValueError("Не задано ни одного условия удаления")
+        query = f'DELETE FROM tasks AS t WHERE {" AND ".join(query_parts)}'
+        for attempt in count():
+            try:
+                with self.transaction() as connection:  # Одна транзакция на все удаление
+                    started, changes = time.perf_counter(), connection.total_changes
+                    deleted = connection.execute(query, params).rowcount
+                    if self.stats is not None:
+                        self._record(connection, query, params, time.perf_counter() - started, changes, deleted)
+                break
+            except sqlite3.OperationalError as error:
+                if not self._retry_busy(error, attempt):
+                    raise
+        self._invalidate()
+        self.logger.debug("Удалено задач: %s, category:'%s', status:'%s', before:'%s'",
+                          deleted, category, status, before_date)
+        return deleted
+
+    def archive(self, before_date) -> int:
+        """Переносит выполненные задачи со сроком строго раньше before_date в архив. Возвращает их число.
+
+        Описания в архиве хранятся сжатыми. Списки, поиск и сводка работают с оставшимися задачами, архив
+        доступен через get_task, iter_tasks и search_tasks с include_archive=True. В журнале изменений
+        перенос в архив выглядит как удаление задачи.
+        """
+        statuses = self._matching_values('tasks', 'status', DONE_STATUSES)
+        # Срок и статус выбираются по индексам idx_tasks_due_on и idx_tasks_status
+        where = f'WHERE t.status IN ({", ".join("?" * len(statuses))}) AND t.due_on < ?'
+        params = (*statuses, iso_date(before_date))
+        queries = (
+            'INSERT INTO tasks_archive (id, title, description, category, due_date, priority, status, due_on, '
+            'priority_rank) SELECT id, title, compress(description), category, due_date, priority, status, due_on, '
+            f'priority_rank FROM tasks AS t {where}',
+            'INSERT INTO tasks_archive_fts (rowid, title, description, category, status) '
+            f'SELECT id, title, description, category, status FROM tasks AS t {where}',
+            f'DELETE FROM tasks AS t {where}',
+        )
+        for attempt in count():
+            try:
+                with self.transaction() as connection:  # Задачи переносятся целиком или не переносятся вовсе
+                    for query in queries:
+                        started, changes = time.perf_counter(), connection.total_changes
+                        archived = connection.execute(query, params).rowcount
+                        if self.stats is not None:
+                            self._record(connection, query, params, time.perf_counter() - started, changes,
+                                         archived)
+                break
+            except sqlite3.OperationalError as error:
+                if not self._retry_busy(error, attempt):
+                    raise
+        self._invalidate()
+        self.logger.debug("В архив перенесено задач: %s, срок раньше %s", archived, before_date)
+        return archived
 
-    @sync_with_search_db
     def _create_table(self):
-        """Создает таблицу задач, если она еще не существует."""
-        query = '''CREATE TABLE IF NOT EXISTS tasks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        description TEXT NOT NULL,
-                        category TEXT NOT NULL,
-                        due_date TEXT NOT NULL,
-                        priority TEXT NOT NULL,
-                        status TEXT NOT NULL DEFAULT 'Не выполнена'
-                    )'''
-        self.execute_query(query, commit=True)
-
-    @sync_with_search_db
+        """Создает или обновляет схему базы до SCHEMA_VERSION, каждая миграция выполняется в своей транзакции.
+
+        Версия перечитывается под блокировкой записи (BEGIN IMMEDIATE), поэтому при одновременном запуске
+        нескольких процессов каждую миграцию применяет только один из них.
+        """
+        connection = self.connection
+        version = self.execute_query('PRAGMA user_version')[0]
+        while version < SCHEMA_VERSION:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                version = connection.execute('PRAGMA user_version').fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    for statement in sql_statements(MIGRATIONS[version]):
+                        connection.execute(statement)
+                    version += 1
+                    connection.execute(f'PRAGMA user_version = {version}')
+                    self.logger.debug("База %s обновлена до версии схемы %s", self.db_name, version)
+                connection.commit()
+            except sqlite3.Error:
+                if connection.in_transaction:
+                    connection.rollback()
+                raise
+
+    def changes_since(self, seq: int = 0, chunk_size: int = CHUNK_SIZE, limit: int = None) -> Iterator[TaskChange]:
+        """Потоково выдает изменения задач с номером больше seq в порядке их выполнения.
+
+        Потребитель запоминает seq последнего обработанного изменения и в следующий раз получает только новые.
+        С seq=0 журнал воспроизводит все задачи базы.
+        """
+        params = [seq]
+        query = ('SELECT seq, task_id, operation, changed_at, data FROM task_changes WHERE seq > ? ORDER BY seq'
+                 + self._page(params, limit, 0))
+        cursor = self.connection.execute(query, params)
+        while rows := cursor.fetchmany(chunk_size):
+            for change_seq, task_id, operation, changed_at, data in rows:
+                values = json.loads(data) if data else None  # Поля Task, затем due_on и priority_rank
+                yield TaskChange(change_seq, task_id, operation, changed_at, Task(*values[:7]) if values else None,
+                                 *(values[7:] if values else ()))
+
+    def last_change_seq(self) -> int:
+        """Номер последнего изменения, 0 - изменений еще не было. Не уменьшается после prune_changes()."""
+        row = self.execute_query("SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'")
+        return row[0] if row else 0
+
+    def prune_changes(self, seq: int) -> int:
+        """Удаляет из журнала изменения с номером не больше seq, уже обработанные всеми потребителями.
+        Возвращает число удаленных записей."""
+        with self.transaction() as connection:
+            pruned = connection.execute('DELETE FROM task_changes WHERE seq <= ?', (seq,)).rowcount
+        self.logger.debug("Из журнала изменений удалено записей: %s", pruned)
+        return pruned
+
     def cleanup_database(self) -> None:
-        self.execute_query('DELETE FROM tasks', commit=True)  # Удалить все задачи из базы данных
+        with self.transaction() as connection:  # Удалить все задачи из базы данных, включая архив
+            connection.execute('DELETE FROM tasks')
+            connection.execute('DELETE FROM tasks_archive')
+            connection.execute("INSERT INTO tasks_archive_fts (tasks_archive_fts) VALUES ('delete-all')")
+        self._invalidate()
         self.logger.debug("База отчищена")
 
 
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from async_task_manager import AsyncTaskManager
+from task_manager import Task
+
+
+@pytest.fixture
+def task_data():
+    """Возвращаем данные для создания задачи."""
+    return Task(task_id=0, title="Асинхронная задача", description="Описание", category="Тест",
+                due_date="15.12.2024", priority="Высокий")
+
+
+def test_concurrent_writes_and_reads(tmp_path, task_data):
+    """Тестируем параллельные записи, объединяемые в группы, и чтения."""
+    async def scenario():
+        async with AsyncTaskManager(str(tmp_path / "async.db"), max_batch=20) as manager:
+            task_ids = await asyncio.gather(*(manager.add_task(task_data) for _ in range(50)))
+            assert len(set(task_ids)) == 50
+            updated = await asyncio.gather(*(manager.update_task(e, status="Выполнена") for e in task_ids[:10]))
+            assert all(task.status == "Выполнена" for task in updated)
+            found, tasks = await asyncio.gather(manager.search_tasks(status="выполнена"), manager.get_task(task_ids))
+            assert sorted(found) == sorted(task_ids[:10])
+            assert [task.task_id for task in tasks] == list(task_ids)
+            assert await manager.delete_task(task_ids[0]) == task_ids[0]
+            assert await manager.get_task(task_ids[0]) is None
+    asyncio.run(scenario())
+
+
+def test_failed_write_does_not_affect_batch(tmp_path, task_data):
+    """Тестируем, что ошибка одной записи в группе не откатывает остальные."""
+    async def scenario():
+        async with AsyncTaskManager(str(tmp_path / "async.db")) as manager:
+            results = await asyncio.gather(
+                manager.add_task(task_data),
+                manager.update_task(1, no_such_column="значение"),
+                manager.add_task(task_data),
+                return_exceptions=True)
+            assert results[0] == 1 and results[2] == 2
+            assert isinstance(results[1], Exception)
+            assert len(await manager.get_task()) == 2
+    asyncio.run(scenario())
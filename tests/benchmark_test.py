@@ -0,0 +1,25 @@
+import json
+from benchmark import main, run_benchmarks, compare, OPERATIONS
+
+
+def test_run_benchmarks_report():
+    """Тестируем, что отчет содержит замеры всех операций для каждого размера базы."""
+    report = run_benchmarks([50], ops=10, seed=1)
+    operations = report['results']['50']
+    assert set(OPERATIONS) <= set(operations)
+    assert operations['delete_task']['count'] == 10
+    assert operations['seed']['count'] == 50
+    assert all(operations[name]['p50_ms'] <= operations[name]['p99_ms'] for name in OPERATIONS)
+
+
+def test_compare_with_baseline(tmp_path):
+    """Тестируем поиск регрессий относительно сохраненного отчета."""
+    baseline = {'results': {'100': {'get_task': {'p50_ms': 1.0}, 'add_task': {'p50_ms': 2.0}}}}
+    report = {'results': {'100': {'get_task': {'p50_ms': 1.5}, 'add_task': {'p50_ms': 2.1}}}}
+    regressions = compare(report, baseline, tolerance=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("get_task")
+    report_file, baseline_file = tmp_path / "report.json", tmp_path / "baseline.json"
+    baseline_file.write_text(json.dumps({'results': {'30': {'get_task': {'p50_ms': 1e-9}}}}), encoding='utf-8')
+    assert main(["run", "--sizes", "30", "--ops", "5", "--report", str(report_file)]) == 0
+    assert json.loads(report_file.read_text(encoding='utf-8'))['results']['30']
+    assert main(["run", "--sizes", "30", "--ops", "5", "--baseline", str(baseline_file)]) == 1
@@ -0,0 +1,161 @@
+import io
+import json
+import pytest
+import commands
+from cli import run
+from task_manager import TaskManager, Task
+
+ADD = ["add", "--title", "Отчет", "--description", "Квартальный отчет", "--category", "Работа",
+       "--due-date", "5.1.2024", "--priority", "Высокий"]
+
+
+@pytest.fixture
+def db_name(tmp_path):
+    """Возвращаем путь к временной базе."""
+    return str(tmp_path / "cli.db")
+
+
+def test_add_done_and_delete(db_name, capsys):
+    """Тестируем команды add, done и del с аргументами."""
+    assert run(["--db", db_name, *ADD]) == 0
+    assert capsys.readouterr().out == "1\n"
+    assert run(["--db", db_name, "done", "1"]) == 0
+    assert run(["--db", db_name, "done", "2"]) == 1
+    with TaskManager(db_name) as manager:
+        task = manager.get_task(1)
+    assert (task.status, task.due_date) == ("Выполнена", "05.01.2024")
+    capsys.readouterr()
+    assert run(["--db", db_name, "del", "--status", "выполнена"]) == 0
+    assert capsys.readouterr().out == "1\n"
+
+
+def test_batch_from_stdin(db_name, capsys, monkeypatch):
+    """Тестируем поток команд из stdin в одной сессии и откат всего потока при ошибке."""
+    commands = "\n".join([" ".join(f'"{arg}"' for arg in ADD), "# комментарий", "", "done 1", "find отчет"])
+    monkeypatch.setattr("sys.stdin", io.StringIO(commands))
+    assert run(["--db", db_name, "batch"]) == 0
+    assert "Статус: Выполнена" in capsys.readouterr().out
+    monkeypatch.setattr("sys.stdin", io.StringIO(" ".join(f'"{arg}"' for arg in ADD) + "\nadd --title\n"))
+    assert run(["--db", db_name, "batch", "-"]) == 1
+    assert "Строка 2" in capsys.readouterr().err
+    with TaskManager(db_name) as manager:
+        assert len(manager.get_task()) == 1
+
+
+@pytest.mark.parametrize("command", ["snapshot", "restore"])
+def test_batch_rejects_snapshot(db_name, tmp_path, capsys, monkeypatch, command):
+    """Тестируем, что снимок и восстановление внутри batch отклоняются сообщением об ошибке, а не трассировкой."""
+    monkeypatch.setattr("sys.stdin", io.StringIO(f"{command} {tmp_path / 'copy.db'}\n"))
+    assert run(["--db", db_name, "batch"]) == 1
+    assert f"Строка 1: {command} не поддерживается внутри batch" in capsys.readouterr().err
+
+
+def test_list_pages_and_formats(db_name, capsys):
+    """Тестируем постраничный вывод и машинные форматы."""
+    with TaskManager(db_name) as manager:
+        for number in range(1, 6):
+            manager.add_task(Task(0, f"Задача {number}", "Описание\tс табуляцией", "Работа", "01.01.2024", "Низкий"))
+    assert run(["--db", db_name, "list", "--after-id", "2", "--limit", "2", "--format", "tsv"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split("\t")[:2] == ["id", "title"]
+    assert [line.split("\t")[0] for line in lines[1:]] == ["3", "4"]
+    assert lines[1].split("\t")[2] == "Описание\\tс табуляцией"
+    assert run(["--db", db_name, "find", "задача", "--sort", "id", "--offset", "3", "--format", "jsonl"]) == 0
+    assert [json.loads(line)["id"] for line in capsys.readouterr().out.splitlines()] == [4, 5]
+
+
+def test_metrics_snapshot(db_name, tmp_path, capsys):
+    """Тестируем сохранение снимка метрик после команды."""
+    metrics_file = tmp_path / "metrics.json"
+    assert run(["--db", db_name, "--metrics", str(metrics_file), *ADD]) == 0
+    metrics = json.loads(metrics_file.read_text(encoding="utf-8"))
+    assert metrics['queries'] >= 2 and 'COMMIT' in metrics['statements']
+
+
+@pytest.mark.parametrize("value, enabled", [("", False), ("1", True)])
+def test_interactive_stats_opt_in(value, enabled, monkeypatch):
+    """Тестируем, что статистика запросов интерактивного режима включается только переменной окружения."""
+    monkeypatch.setenv(commands.STATS_VARIABLE, value)
+    monkeypatch.setattr(commands, "_task_manager", None)
+    manager = commands.get_task_manager()
+    assert (manager.stats is not None) == enabled
+    manager.close()
+
+
+def test_read_only(db_name, capsys):
+    """Тестируем чтение в режиме только для чтения и отказ в записи."""
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, "--read-only", "list", "--format", "jsonl"]) == 0
+    assert json.loads(capsys.readouterr().out.splitlines()[-1])["title"] == "Отчет"
+    assert run(["--db", db_name, "--read-only", "done", "1"]) != 0
+
+
+def test_changes(db_name, capsys):
+    """Тестируем вывод журнала изменений начиная с заданного номера."""
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, "done", "1"]) == 0
+    capsys.readouterr()
+    assert run(["--db", db_name, "changes", "--since", "1"]) == 0
+    [record] = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert (record["seq"], record["operation"], record["task"]["status"]) == (2, "update", "Выполнена")
+
+
+def test_unsharded_commands(db_name, capsys):
+    """Тестируем понятную ошибку для команд, не поддерживающих шарды."""
+    for command in (["changes"], ["overdue"], ["next"], ["due", "01.01.2024", "31.01.2024"]):
+        assert run(["--db", db_name, "--shards", "2", *command]) == 1
+        assert "--shards" in capsys.readouterr().err
+
+
+def test_summary(db_name, capsys):
+    """Тестируем вывод сводки по задачам."""
+    assert run(["--db", db_name, *ADD]) == 0
+    capsys.readouterr()
+    assert run(["--db", db_name, "summary", "--format", "json"]) == 0
+    assert json.loads(capsys.readouterr().out)["category"] == {"Работа": 1}
+    assert run(["--db", db_name, "summary"]) == 0
+    assert capsys.readouterr().out.startswith("Всего задач: 1\n")
+
+
+def test_archive(db_name, capsys):
+    """Тестируем перенос выполненных задач в архив и вывод архива по флагу --archive."""
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, "done", "1"]) == 0
+    capsys.readouterr()
+    assert run(["--db", db_name, "archive", "01.01.2025"]) == 0
+    assert capsys.readouterr().out == "1\n"
+    assert run(["--db", db_name, "find", "отчет", "--format", "jsonl"]) == 0
+    assert [json.loads(line)["id"] for line in capsys.readouterr().out.splitlines()] == [2]
+    assert run(["--db", db_name, "find", "отчет", "--archive", "--format", "jsonl"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["id"] for record in records] == [1, 2]
+    assert records[0]["description"] == "Квартальный отчет"
+    assert run(["--db", db_name, "list", "--archive", "--format", "jsonl"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+def test_snapshot_and_restore(db_name, tmp_path, capsys):
+    """Тестируем копию базы и восстановление из нее."""
+    snapshot = str(tmp_path / "copy.db")
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, "snapshot", snapshot]) == 0
+    assert run(["--db", db_name, "del", "1"]) == 0
+    assert run(["--db", db_name, "restore", snapshot]) == 0
+    capsys.readouterr()
+    assert run(["--db", db_name, "list", "--format", "jsonl"]) == 0
+    assert json.loads(capsys.readouterr().out.splitlines()[0])["id"] == 1
+    assert run(["--db", db_name, "restore", str(tmp_path / "missing.db")]) == 1
+
+
+def test_deadlines(db_name, capsys):
+    """Тестируем команды overdue, next и due."""
+    assert run(["--db", db_name, *ADD]) == 0
+    assert run(["--db", db_name, *ADD[:-4], "--due-date", "01.01.2999", "--priority", "Низкий"]) == 0
+    capsys.readouterr()
+    assert run(["--db", db_name, "overdue", "--format", "jsonl"]) == 0
+    assert [json.loads(line)["id"] for line in capsys.readouterr().out.splitlines()] == [1]
+    assert run(["--db", db_name, "next", "5", "--format", "jsonl"]) == 0
+    assert [json.loads(line)["id"] for line in capsys.readouterr().out.splitlines()] == [2]
+    assert run(["--db", db_name, "due", "1.1.2024", "31.12.2999", "--format", "jsonl"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
@@ -1,4 +1,39 @@
+import atexit
 import logging.config
+import logging.handlers
+import os
+import queue
 
+CONFIG_FILE = 'log_dir/logging.ini'
+listener = None  # Фоновый поток записи логов, запускается первым вызовом setup_logging()
+LEVEL_VARIABLE = 'TASK_MANAGER_LOG_LEVEL'  # Переменная окружения для уровня логирования без правки конфигурации
 
-logging.config.fileConfig('log_dir/logging.ini')
+
+def setup_logging(config_file=CONFIG_FILE) -> logging.handlers.QueueListener:
+    """Загружает конфигурацию и переносит обработчики корневого логгера в фоновый поток QueueListener.
+
+    Повторные вызовы ничего не делают, поэтому функцию можно вызывать при первом использовании логирования.
+    """
+    global listener
+    if listener is not None:
+        return listener
+    logging.config.fileConfig(config_file, disable_existing_loggers=False)
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for handler in handlers:
+        root.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    # QueueHandler подставляет аргументы в сообщение сразу, и только для записей, прошедших проверку уровня:
+    # изменяемые аргументы (например, списки результатов) могут измениться до записи фоновым потоком
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Дописать оставшиеся в очереди записи при выходе
+    if os.environ.get(LEVEL_VARIABLE):
+        set_log_level(os.environ[LEVEL_VARIABLE])
+    return listener
+
+
+def set_log_level(level: str | int) -> None:
+    """Меняет уровень логирования во время работы, например 'INFO', чтобы отключить отладочные записи."""
+    logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
@@ -0,0 +1,35 @@
+import io
+import pytest
+from renderer import TaskRenderer
+from task_manager import Task
+
+
+def test_text_layout():
+    """Тестируем текстовую карточку: короткие поля по два в строке, длинные на отдельной строке."""
+    out = io.StringIO()
+    task = Task(7, "Короткое", "Очень длинное описание задачи", "Работа", "01.01.2024", "Высокий")
+    assert TaskRenderer(out=out).render([task]) == 1
+    assert out.getvalue().splitlines() == [
+        "ID задачи: 7               Название: Короткое       ",
+        " Описание: Очень длинное описание задачи",
+        "Категория: Работа              Дата: 01.01.2024     ",
+        "Приоритет: Высокий           Статус: Не выполнена   ",
+        "-" * 60,
+    ]
+
+
+def test_buffered_writes():
+    """Тестируем, что строки пишутся в поток пачками, а не по одной."""
+    class CountingIO(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    out = CountingIO()
+    tasks = (Task(i, "Задача", "Описание", "Работа", "01.01.2024", "Низкий") for i in range(2500))
+    assert TaskRenderer("jsonl", out, flush_every=1000).render(tasks) == 2500
+    assert out.writes == 3
+    with pytest.raises(ValueError):
+        TaskRenderer("xml")
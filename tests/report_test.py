@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import pytest
+import report
+from cli import run
+from report import build_report, load_columns, write_report
+from sharding import ShardedTaskManager
+from task_manager import TaskManager, Task
+
+
+def make_tasks() -> list[Task]:
+    """Задачи с разными категориями, приоритетами, статусами и сроками (одна - с нераспознанным сроком)."""
+    return [
+        Task(0, "Отчет", "Квартальный отчет", "Работа", "01.03.2024", "Высокий", "Не выполнена"),
+        Task(0, "Письмо", "Ответить клиенту", "Работа", "06.03.2024", "Средний", "Выполнена"),
+        Task(0, "Ремонт", "Покрасить забор", "Дом", "12.03.2024", "Низкий", "Не выполнена"),
+        Task(0, "Покупки", "Купить продукты", "Дом", "2024-03-04", "средний", "Не выполнена"),
+        Task(0, "Звонок", "Позвонить маме", "Семья", "когда-нибудь", "Срочно", "Не выполнена"),
+    ]
+
+
+@pytest.fixture(params=['array', 'numpy'])
+def engine(request, monkeypatch):
+    """Отчет считается без NumPy и, если он установлен, с NumPy: результаты должны совпадать."""
+    module = pytest.importorskip('numpy') if request.param == 'numpy' else None
+    monkeypatch.setattr(report, 'numpy', module)
+    monkeypatch.setattr(report, '_numpy_loaded', True)
+    return request.param
+
+
+@pytest.fixture
+def manager():
+    with TaskManager(":memory:", verbose=False) as manager:
+        manager.bulk_add(make_tasks())
+        yield manager
+
+
+def test_load_columns(manager, engine):
+    """Тестируем загрузку столбцов: словари категорий и статусов, ранги и номера дней сроков."""
+    columns = load_columns(manager, chunk_size=2)
+    assert len(columns) == 5
+    assert columns.categories == ["Работа", "Дом", "Семья"]
+    assert list(columns.category) == [0, 0, 1, 1, 2]
+    assert list(columns.priority) == [3, 2, 1, 2, 0]
+    assert columns.due[0] == 738946 and columns.due[4] == 0  # date(2024, 3, 1).toordinal()
+    assert columns.done_codes() == {1}
+
+
+def test_build_report(manager, engine):
+    """Тестируем счетчики, долю просроченных, сроки по неделям и приоритеты по категориям."""
+    result = build_report(manager, "05.03.2024")
+    assert result['engine'] == engine and result['tasks'] == 5
+    assert result['counts']['category'] == {"Работа": 2, "Дом": 2, "Семья": 1}
+    assert result['counts']['priority'] == {"Не указан": 1, "Низкий": 1, "Средний": 2, "Высокий": 1}
+    assert result['overdue'] == {'open': 4, 'overdue': 2, 'ratio': 0.5, 'by_category': {
+        "Работа": {'open': 1, 'overdue': 1, 'ratio': 1.0}, "Дом": {'open': 2, 'overdue': 1, 'ratio': 0.5},
+        "Семья": {'open': 1, 'overdue': 0, 'ratio': 0.0}}}
+    assert result['weekly_due'] == {"2024-02-26": {'total': 1, 'open': 1}, "2024-03-04": {'total': 2, 'open': 1},
+                                    "2024-03-11": {'total': 1, 'open': 1}}
+    assert result['priority_by_category']["Дом"] == {"Низкий": 1, "Средний": 1}
+
+
+def test_report_archive_and_shards(tmp_path):
+    """Тестируем отчет по архиву и по шардированному хранилищу."""
+    with ShardedTaskManager(str(tmp_path / "report.db"), shards=2, verbose=False) as manager:
+        manager.bulk_add(make_tasks())
+        assert manager.archive("01.04.2024") == 1
+        assert build_report(manager)['tasks'] == 4
+        assert build_report(manager, include_archive=True)['counts']['status'] == {"Не выполнена": 4, "Выполнена": 1}
+
+
+def test_write_report(manager):
+    """Тестируем вывод отчета в JSON и CSV."""
+    result = build_report(manager, "05.03.2024")
+    out = io.StringIO()
+    write_report(result, 'csv', out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['section', 'group', 'key', 'value']
+    assert ['overdue', '', 'ratio', '0.5'] in rows and ['counts', 'category', 'Дом', '2'] in rows
+    out = io.StringIO()
+    write_report(result, 'json', out)
+    assert json.loads(out.getvalue()) == result
+    with pytest.raises(ValueError):
+        write_report(result, 'xml', out)
+
+
+def test_cli_report(tmp_path, capsys):
+    """Тестируем команду report неинтерактивного режима."""
+    db_name = str(tmp_path / "cli.db")
+    with TaskManager(db_name, verbose=False) as manager:
+        manager.bulk_add(make_tasks())
+    assert run(["--db", db_name, "report", "--today", "05.03.2024"]) == 0
+    assert capsys.readouterr().out.startswith("Отчет на 2024-03-05, задач: 5\nПросрочено: 2 из 4")
+    output = tmp_path / "report.csv"
+    assert run(["--db", db_name, "--read-only", "report", "--format", "csv", "--output", str(output)]) == 0
+    assert output.read_text(encoding='utf-8').startswith("section,group,key,value")
@@ -0,0 +1,109 @@
+import threading
+import pytest
+from datetime import date
+from unittest.mock import patch
+from scheduler import DeadlineScheduler
+from sharding import ShardedTaskManager
+from task_manager import TaskManager, Task
+
+TODAY = "10.06.2024"
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Возвращаем менеджер с задачами, сроки которых раньше, равны и позже TODAY."""
+    with TaskManager(str(tmp_path / "deadlines.db"), verbose=False) as manager:
+        manager.bulk_add([
+            Task(0, "Давняя", "", "Работа", "01.05.2024", "Низкий"),
+            Task(0, "Вчерашняя", "", "Работа", "09.06.2024", "Высокий"),
+            Task(0, "Сделанная", "", "Работа", "02.05.2024", "Высокий", "Выполнена"),
+            Task(0, "Сегодня низкая", "", "Дом", "10.06.2024", "Низкий"),
+            Task(0, "Сегодня высокая", "", "Дом", "10.06.2024", "Высокий"),
+            Task(0, "Будущая", "", "Дом", "2024-07-01", "Средний"),
+        ])
+        yield manager
+
+
+@pytest.mark.parametrize("live", [False, True])
+def test_queries(manager, live):
+    """Тестируем просроченные, ближайшие и задачи за период: порядок по сроку, затем по приоритету.
+    Запросы по индексу и по расписанию в памяти дают одинаковый результат."""
+    scheduler = DeadlineScheduler(manager)
+    if live:
+        scheduler.rebuild()
+    assert scheduler.overdue(TODAY) == [1, 2]
+    assert scheduler.upcoming(2, TODAY) == [5, 4]
+    assert scheduler.upcoming(10, TODAY) == [5, 4, 6]
+    assert scheduler.due_between("09.06.2024", "2024-07-01") == [2, 5, 4, 6]
+    assert len(scheduler) == 5
+
+
+def test_one_shot_queries(manager):
+    """Тестируем, что запросы без построенного расписания не читают все задачи со сроком, а идут по индексу."""
+    scheduler = DeadlineScheduler(manager)
+    with patch.object(scheduler, "rebuild") as rebuild:
+        assert scheduler.upcoming(1, TODAY) == [5]
+        rebuild.assert_not_called()
+    plan = manager.execute_query("EXPLAIN QUERY PLAN SELECT id FROM tasks WHERE due_on >= ? AND status NOT IN (?) "
+                                 "ORDER BY due_on, priority_rank DESC, id LIMIT ?", ["", "Выполнена", 1],
+                                 one_line=False)
+    assert [row[-1] for row in plan] == ["SEARCH tasks USING INDEX idx_tasks_due_on (due_on>?)"]
+
+
+def test_follows_changes(manager):
+    """Тестируем обновление расписания по журналу изменений, в том числе сделанных другим менеджером."""
+    scheduler = DeadlineScheduler(manager)
+    scheduler.rebuild()
+    assert scheduler.overdue(TODAY) == [1, 2]
+    with TaskManager(manager.db_name, verbose=False) as other:  # Как другой процесс
+        other.update_task(1, status="Выполнена")
+        other.update_task(3, status="Не выполнена")
+        other.update_task(6, due_date="01.01.2024")
+        task_id = other.add_task(Task(0, "Новая", "", "Дом", "10.06.2024", "Средний"))
+        other.delete_task(2)
+    with patch.object(scheduler, "rebuild") as rebuild:
+        assert scheduler.overdue(TODAY) == [6, 3]
+        assert scheduler.upcoming(3, TODAY) == [5, task_id, 4]
+        rebuild.assert_not_called()  # Только изменения, без повторного чтения таблицы
+    manager.prune_changes(manager.last_change_seq())
+    manager.delete_task(5)
+    manager.prune_changes(manager.last_change_seq())
+    assert scheduler.upcoming(3, TODAY) == [task_id, 4]  # Изменения удалены из журнала - расписание построено заново
+
+
+def test_unpadded_due_date(manager):
+    """Тестируем, что построение расписания и обновление по журналу одинаково понимают срок задачи."""
+    scheduler = DeadlineScheduler(manager)
+    scheduler.rebuild()
+    manager.execute_query("UPDATE tasks SET due_date = '1.5.2024' WHERE id = 1", commit=True)
+    manager.execute_query("UPDATE tasks SET priority = 'вЫсокий' WHERE id = 5", commit=True)
+    expected = (scheduler.overdue(TODAY), scheduler.upcoming(10, TODAY))
+    scheduler.rebuild()
+    assert (scheduler.overdue(TODAY), scheduler.upcoming(10, TODAY)) == expected
+
+
+def test_sharded_manager(tmp_path):
+    """Тестируем отказ строить расписание по базе из шардов."""
+    with ShardedTaskManager(str(tmp_path / "deadlines.db"), shards=2, verbose=False) as manager:
+        with pytest.raises(ValueError):
+            DeadlineScheduler(manager)
+
+
+def test_reminders(manager):
+    """Тестируем напоминания: по одному разу о каждой наступившей задаче."""
+    scheduler = DeadlineScheduler(manager)
+    reminded, done = [], threading.Event()
+
+    def remind(task):
+        reminded.append(task.task_id)
+        if len(reminded) == 4:
+            done.set()
+
+    with patch("scheduler.date") as fake_date:
+        fake_date.today.return_value = date(2024, 6, 10)
+        scheduler.start_reminders(remind, interval_s=0.01)
+        assert done.wait(5)
+        with pytest.raises(RuntimeError):
+            scheduler.start_reminders(remind)
+        scheduler.stop_reminders()
+    assert sorted(reminded) == [1, 2, 4, 5]
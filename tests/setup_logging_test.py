@@ -0,0 +1,37 @@
+import logging
+from logging.handlers import QueueHandler, RotatingFileHandler
+from log_dir.setup_logging import setup_logging, set_log_level
+
+
+def test_logging_goes_through_queue():
+    """Тестируем, что корневой логгер пишет через очередь, а файл обслуживает фоновый поток с ротацией."""
+    listener = setup_logging()
+    assert setup_logging() is listener  # Повторная настройка не выполняется
+    root = logging.getLogger()
+    assert [type(handler) for handler in root.handlers if isinstance(handler, QueueHandler)]
+    assert not [handler for handler in root.handlers if isinstance(handler, RotatingFileHandler)]
+    assert any(isinstance(handler, RotatingFileHandler) for handler in listener.handlers)
+
+
+def test_set_log_level():
+    """Тестируем переключение уровня логирования во время работы."""
+    root = logging.getLogger()
+    level = root.level
+    try:
+        set_log_level("info")
+        assert not root.isEnabledFor(logging.DEBUG)
+        set_log_level(logging.DEBUG)
+        assert root.isEnabledFor(logging.DEBUG)
+    finally:
+        root.setLevel(level)
+
+
+def test_message_formatted_before_queue():
+    """Тестируем, что сообщение формируется до постановки в очередь: изменение аргументов после вызова
+    логгера не меняет запись."""
+    setup_logging()
+    handler = next(handler for handler in logging.getLogger().handlers if isinstance(handler, QueueHandler))
+    found = [1]
+    record = handler.prepare(logging.makeLogRecord({'msg': "Найдены задачи %s", 'args': (found,)}))
+    found.append(2)
+    assert record.getMessage() == "Найдены задачи [1]"
@@ -0,0 +1,107 @@
+import random
+import pytest
+from sharding import ShardedTaskManager, shard_files
+from task_manager import TaskManager, Task
+
+CATEGORIES = ("Работа", "Дом", "Учеба", "Здоровье", "Отдых")
+
+
+@pytest.fixture
+def sample_tasks():
+    """Возвращаем одинаковый набор задач для обеих реализаций."""
+    rng = random.Random(7)
+    return [Task(0, f"Задача {rng.choice(['отчет', 'звонок', 'покупки'])} {i}", "Описание", rng.choice(CATEGORIES),
+                 f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.2024", rng.choice(["Низкий", "Средний", "Высокий"]),
+                 rng.choice(["Не выполнена", "Выполнена"])) for i in range(60)]
+
+
+@pytest.fixture(params=['id', 'category'])
+def managers(request, tmp_path, sample_tasks):
+    """Возвращаем обычный и разделенный на 3 шарда менеджеры с одинаковыми задачами."""
+    single = TaskManager(str(tmp_path / "single.db"), verbose=False)
+    sharded = ShardedTaskManager(str(tmp_path / "sharded.db"), shards=3, partition=request.param, verbose=False)
+    single.bulk_add(sample_tasks)
+    sharded.bulk_add(sample_tasks, batch_size=25)
+    yield single, sharded
+    single.close()
+    sharded.close()
+
+
+def fields_of(tasks):
+    return [(task.title, task.category, task.due_date, task.priority, task.status) for task in tasks]
+
+
+def test_crud(managers, sample_tasks):
+    """Тестируем добавление, чтение, изменение и удаление по глобальным ID."""
+    _, sharded = managers
+    task_ids = [task.task_id for task in sharded.get_task()]
+    assert len(task_ids) == len(set(task_ids)) == len(sample_tasks)
+    assert task_ids == sorted(task_ids)
+    task_id = sharded.add_task(sample_tasks[0])
+    assert sharded.get_task(task_id).task_id == task_id
+    assert sharded.update_task(task_id, status="Выполнена").status == "Выполнена"
+    assert [task.task_id for task in sharded.get_task([task_id, task_ids[5], 10 ** 6])] == [task_id, task_ids[5]]
+    assert sharded.delete_task(task_id) == task_id
+    assert sharded.get_task(task_id) is None and sharded.delete_task(task_id) is None
+    assert sharded.update_task(task_id, title="x") == "Task not found"
+
+
+def test_search_matches_single_database(managers):
+    """Тестируем, что объединенный поиск совпадает с поиском в одной базе (кроме порядка по релевантности)."""
+    single, sharded = managers
+
+    def found(manager, **kwargs):
+        return fields_of(manager.get_task(manager.search_tasks(**kwargs)))
+
+    for kwargs in ({'category': 'работа'}, {'status': 'выполнена', 'order_by': 'due_date'},
+                   {'priority': 'высокий', 'order_by': 'priority', 'limit': 5, 'offset': 3},
+                   {'due_from': '01.03.2024', 'due_to': '30.06.2024', 'order_by': 'due_date', 'limit': 7}):
+        assert found(sharded, **kwargs) == found(single, **kwargs), kwargs
+    assert sorted(found(sharded, keyword="отчет")) == sorted(found(single, keyword="отчет"))
+    assert sorted(sharded.categories()) == sorted(single.categories())
+
+
+def test_paging_and_delete_where(managers):
+    """Тестируем страницы по ключу и limit/offset при слиянии шардов и удаление по условиям во всех шардах."""
+    single, sharded = managers
+    all_ids = [task.task_id for task in sharded.iter_tasks()]
+    assert [task.task_id for task in sharded.iter_tasks(after_id=all_ids[9], limit=5)] == all_ids[10:15]
+    assert [task.task_id for task in sharded.iter_tasks(limit=4, offset=2)] == all_ids[2:6]
+    assert sharded.search_tasks(after_id=all_ids[-3]) == all_ids[-2:]
+    assert sharded.delete_where(status="выполнена") == single.delete_where(status="выполнена")
+    assert sorted(fields_of(sharded.get_task())) == sorted(fields_of(single.get_task()))
+
+
+def test_category_partition(tmp_path, sample_tasks):
+    """Тестируем, что при разделении по категории все задачи категории лежат в одном шарде."""
+    with ShardedTaskManager(str(tmp_path / "tasks.db"), shards=3, partition='category') as sharded:
+        sharded.bulk_add(sample_tasks)
+        for category in CATEGORIES:
+            assert sum(bool(shard.search_tasks(category=category)) for shard in sharded.shards) == 1
+    assert shard_files(str(tmp_path / "tasks.db"), 2) == [str(tmp_path / "tasks.0.db"), str(tmp_path / "tasks.1.db")]
+    with pytest.raises(ValueError, match="большим числом шардов"):
+        ShardedTaskManager(str(tmp_path / "tasks.db"), shards=2)
+
+
+def test_transaction(managers, sample_tasks):
+    """Тестируем откат изменений во всех шардах при ошибке в транзакции."""
+    _, sharded = managers
+    with pytest.raises(RuntimeError):
+        with sharded.transaction():
+            sharded.bulk_add(sample_tasks[:6])
+            sharded.cleanup_database()
+            raise RuntimeError("откат")
+    assert len(sharded.get_task()) == len(sample_tasks)
+
+
+def test_snapshot_and_restore(tmp_path, sample_tasks):
+    """Тестируем копию шардов и восстановление из нее."""
+    with ShardedTaskManager(str(tmp_path / "tasks.db"), shards=2, verbose=False) as manager:
+        manager.bulk_add(sample_tasks[:10])
+        manager.snapshot(str(tmp_path / "copy.db"))
+        assert all((tmp_path / name).exists() for name in ("copy.0.db", "copy.1.db"))
+        manager.delete_where(category=CATEGORIES[0])
+        manager.restore(str(tmp_path / "copy.db"))
+        assert len(manager.get_task()) == 10
+        with pytest.raises(FileNotFoundError):
+            manager.restore(str(tmp_path / "missing.db"))
@@ -0,0 +1,60 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from task_manager import TaskManager
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_US = 250_000  # Бюджет на импорт commands (около 70 мс), с запасом для медленных машин
+
+
+def import_time(module: str, cwd: Path) -> int:
+    """Запускает python -X importtime и возвращает суммарное время импорта модуля в микросекундах."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+        if name == module:
+            return int(cumulative)
+    raise AssertionError(f"Модуль {module} не найден в выводе importtime")
+
+
+def test_import_commands_is_cheap(tmp_path):
+    """Тестируем, что импорт commands не открывает базы и не настраивает логирование, и замеряем его время."""
+    cumulative = import_time("commands", tmp_path)
+    print(f"\nИмпорт commands: {cumulative / 1000:.1f} мс")
+    assert list(tmp_path.iterdir()) == []  # Ни баз данных, ни файлов логов
+    assert cumulative < IMPORT_BUDGET_US
+
+
+def test_import_skips_optional_modules(tmp_path):
+    """Тестируем, что запуск не импортирует NumPy: он нужен только отчетам и загружается первым из них."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    code = "import sys, cli, commands; assert 'numpy' not in sys.modules, 'numpy'"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, check=True)
+
+
+def test_schema_checked_once_per_file(tmp_path):
+    """Тестируем, что миграции схемы проверяются один раз на файл базы."""
+    db_name = str(tmp_path / "lazy.db")
+    with TaskManager(db_name) as manager:
+        assert not (tmp_path / "lazy.db").exists()  # База открывается при первом запросе
+        manager.get_task()
+    with patch.object(TaskManager, "_create_table") as create_table:
+        with TaskManager(db_name) as manager:
+            manager.get_task()
+        create_table.assert_not_called()
+
+
+def test_exit_record_logged(tmp_path):
+    """Тестируем, что запись о завершении программы попадает в лог до остановки фонового потока логов."""
+    (tmp_path / "log_dir").mkdir()
+    shutil.copy(ROOT / "log_dir" / "logging.ini", tmp_path / "log_dir")
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    subprocess.run([sys.executable, str(ROOT / "main.py"), "--db", "exit.db", "summary"],
+                   cwd=tmp_path, env=env, capture_output=True, check=True)
+    log = (tmp_path / "log_dir" / "log_data.log").read_text(encoding="utf-8")
+    assert log.splitlines()[-1].endswith("Завершение программы")
@@ -0,0 +1,40 @@
+import pytest
+from task_io import read_tasks, write_tasks
+from task_manager import TaskManager, Task
+
+
+@pytest.fixture
+def tasks_list():
+    """Возвращаем задачи для импорта и экспорта."""
+    return [
+        Task(task_id=0, title="Купить продукты", description="Хлеб, молоко; яйца", category="Личные дела",
+             due_date="10.10.2023", priority="Средний"),
+        Task(task_id=0, title='Отчет "Q3"', description="Подготовить отчет,\nсо второй строкой", category="Работа",
+             due_date="15.10.2023", priority="Высокий", status="Выполнена"),
+    ]
+
+
+@pytest.mark.parametrize("file_name", ["tasks.jsonl", "tasks.csv"])
+def test_export_import_round_trip(tmp_path, tasks_list, file_name):
+    """Тестируем экспорт задач в файл и импорт обратно в новую базу."""
+    file_path = tmp_path / file_name
+    with TaskManager(str(tmp_path / "source.db")) as source:
+        source.bulk_add(tasks_list)
+        assert write_tasks(source.iter_tasks(), file_path) == 2
+    with TaskManager(str(tmp_path / "target.db")) as target:
+        assert target.bulk_add(read_tasks(file_path)) == 2
+        imported = target.get_task()
+    for expected, task in zip(tasks_list, imported):
+        assert (task.title, task.description, task.category, task.due_date, task.priority, task.status) == (
+            expected.title, expected.description, expected.category, expected.due_date, expected.priority,
+            expected.status)
+
+
+def test_import_validation(tmp_path):
+    """Тестируем ошибки формата файла и незаполненных полей."""
+    with pytest.raises(ValueError):
+        list(read_tasks(tmp_path / "tasks.txt"))
+    file_path = tmp_path / "tasks.jsonl"
+    file_path.write_text('{"title": "Без описания"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Строка 1"):
+        list(read_tasks(file_path))
@@ -1,13 +1,18 @@
+import os
 import pytest
 import sqlite3
-from task_manager import TaskManager, Task
+import threading
+import time
+from dataclasses import astuple
+from task_manager import TaskManager, Task, SCHEMA_VERSION
 from unittest.mock import patch
 
 
 @pytest.fixture(scope="module")
 def task_manager():
-    """Создаем тестовый экземпляр TaskManager."""
-    return TaskManager()
+    """Создаем тестовый экземпляр TaskManager с базой в памяти: тесты не трогают файлы и не мешают друг другу."""
+    with TaskManager(":memory:") as manager:
+        yield manager
 
 
 @pytest.fixture(scope="module")
@@ -135,10 +140,7 @@ def test_sync_with_search_db(task_manager, task_data):
 
 def test_create_table(task_manager):
     """Тестируем создание таблицы задач."""
-    with sqlite3.connect(task_manager.db_name) as connection:
-        cursor = connection.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks';")
-        table = cursor.fetchone()
+    table = task_manager.execute_query("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks';")
 
     assert table is not None and table[0] == 'tasks'
 
@@ -151,3 +153,530 @@ def test_add_task_with_mock(mock_add_task, task_data):
     task_data.task_id = mock_add_task(task_data)
 
     assert task_data.task_id == 1
+
+
+def test_connection_pool_reused(tmp_path):
+    """Тестируем, что соединение потока переиспользуется и закрывается вместе с менеджером."""
+    with TaskManager(str(tmp_path / "pool.db"), synchronous="full", cache_size=-4000) as manager:
+        connection = manager.connection
+        assert manager.connection is connection
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2
+        assert connection.execute("PRAGMA cache_size").fetchone()[0] == -4000
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute("SELECT 1")
+    assert manager.connection is not connection  # После close() соединение открывается заново
+    manager.close()
+
+
+def test_invalid_synchronous_mode(tmp_path):
+    """Тестируем проверку режима synchronous."""
+    with pytest.raises(ValueError):
+        TaskManager(str(tmp_path / "pool.db"), synchronous="fast")
+
+
+def test_full_text_search(tmp_path, task_data):
+    """Тестируем полнотекстовый индекс: регистр кириллицы, ранжирование и синхронизацию триггерами."""
+    with TaskManager(str(tmp_path / "fts.db")) as manager:
+        task_id = manager.add_task(task_data)
+        other_id = manager.add_task(Task(0, "Отчет", "Задача задача задача", "Работа", "01.01.2025", "Низкий"))
+        assert manager.search_tasks(keyword="ТЕСТОВАЯ") == [task_id]
+        assert manager.search_tasks(keyword="тест") == [task_id]  # Поиск по префиксу слова
+        assert manager.search_tasks(keyword="задача") == [other_id, task_id]  # Сначала более релевантные
+        assert manager.search_tasks(category="тест", status="не выполнена") == [task_id]
+        assert manager.search_tasks(keyword="!!!") == []
+        manager.update_task(task_id, title="Переименованная")
+        assert manager.search_tasks(keyword="тестовая") == []
+        assert manager.search_tasks(keyword="переименованная") == [task_id]
+        manager.delete_task(other_id)
+        assert manager.search_tasks(keyword="отчет") == []
+    assert not (tmp_path / "search_tasks.db").exists()
+
+
+def test_get_task_batched(tmp_path, task_data):
+    """Тестируем пакетное получение задач: порядок вызывающего, пропуск несуществующих ID и потоковый вариант."""
+    with TaskManager(str(tmp_path / "batch.db")) as manager:
+        ids = [manager.add_task(task_data) for _ in range(7)]
+        requested = [ids[5], 100500, ids[0], ids[3], ids[0]]
+        assert [task.task_id for task in manager.get_task(requested)] == [ids[5], ids[0], ids[3], ids[0]]
+        streamed = manager.iter_tasks(reversed(ids), chunk_size=2)
+        assert [task.task_id for task in streamed] == ids[::-1]
+        assert [task.task_id for task in manager.iter_tasks(chunk_size=3)] == ids
+
+
+def test_bulk_add(tmp_path, task_data):
+    """Тестируем пакетное добавление задач с отчетом о прогрессе."""
+    progress = []
+    with TaskManager(str(tmp_path / "bulk.db")) as manager:
+        added = manager.bulk_add((task_data for _ in range(25)), batch_size=10, progress=progress.append)
+        assert added == 25
+        assert progress == [10, 20, 25]
+        assert len(manager.get_task()) == 25
+        assert len(manager.search_tasks(keyword="тестовая")) == 25  # Индекс поиска заполнен триггерами
+
+
+def test_schema_migration(tmp_path):
+    """Тестируем обновление базы, созданной до появления версий схемы."""
+    db_name = str(tmp_path / "old.db")
+    with sqlite3.connect(db_name) as connection:
+        connection.execute('''CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                              description TEXT NOT NULL, category TEXT NOT NULL, due_date TEXT NOT NULL,
+                              priority TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'Не выполнена')''')
+        connection.execute("INSERT INTO tasks (title, description, category, due_date, priority) "
+                           "VALUES ('Старая задача', 'Описание', 'Архив', '01.02.2023', 'Низкий')")
+    connection.close()
+    with TaskManager(db_name) as manager:
+        assert manager.execute_query('PRAGMA user_version')[0] == SCHEMA_VERSION
+        assert manager.execute_query('SELECT due_on, priority_rank FROM tasks') == ('2023-02-01', 1)
+        assert manager.search_tasks(keyword="старая") == [1]  # Индекс поиска построен по существующим данным
+    with TaskManager(db_name) as manager:  # Повторное открытие не применяет миграции заново
+        assert manager.get_task(1).title == "Старая задача"
+
+
+def test_schema_deleted_file(tmp_path, task_data):
+    """Тестируем повторное открытие базы, файл которой удалили после первого открытия в этом процессе."""
+    db_name = str(tmp_path / "gone.db")
+    with TaskManager(db_name, verbose=False) as manager:
+        manager.add_task(task_data)
+    os.remove(db_name)
+    with TaskManager(db_name, verbose=False) as manager:
+        assert manager.get_task() == []
+        assert manager.add_task(task_data) == 1
+
+
+def test_search_by_due_date_and_priority(tmp_path):
+    """Тестируем фильтры по диапазону сроков и приоритету и сортировки."""
+    with TaskManager(str(tmp_path / "dates.db")) as manager:
+        first = manager.add_task(Task(0, "Первая", "Описание", "Работа", "20.10.2023", "Низкий"))
+        second = manager.add_task(Task(0, "Вторая", "Описание", "Работа", "2023-10-05", "Высокий"))
+        third = manager.add_task(Task(0, "Третья", "Описание", "Работа", "05.10.2023", "Средний"))
+        fourth = manager.add_task(Task(0, "Четвертая", "Описание", "Дом", "01.12.2023", "Высокий"))
+        assert manager.search_tasks(order_by="due_date") == [second, third, first, fourth]
+        assert manager.search_tasks(order_by="priority") == [second, fourth, third, first]
+        assert manager.search_tasks(due_from="01.10.2023", due_to="2023-10-31", order_by="due_date") == [
+            second, third, first]
+        assert manager.search_tasks(priority="высокий", category="работа") == [second]
+        assert manager.search_tasks(keyword="описание", due_from="01.11.2023") == [fourth]
+        with pytest.raises(ValueError):
+            manager.search_tasks(order_by="title")
+        with pytest.raises(ValueError):
+            manager.search_tasks(priority="Срочный")
+        with pytest.raises(ValueError):
+            manager.search_tasks(due_to="31.02.2023")
+
+
+def test_unpadded_due_date(tmp_path):
+    """Тестируем, что сроки без ведущих нулей дополняются при записи и миграцией и находятся по периоду."""
+    db_name = str(tmp_path / "unpadded.db")
+    with TaskManager(db_name, verbose=False) as manager:
+        first = manager.add_task(Task(0, "Первая", "Описание", "Работа", "5.1.2024", "Низкий"))
+        manager.bulk_add([Task(0, "Вторая", "Описание", "Работа", "2024-1-6", "Низкий"),
+                          Task(0, "Третья", "Описание", "Работа", "когда-нибудь", "Низкий")])
+        second, third = first + 1, first + 2
+        manager.update_task(third, due_date="7.1.2024")
+        assert [manager.get_task(task_id).due_date for task_id in (first, second, third)] == [
+            "05.01.2024", "2024-01-06", "07.01.2024"]
+        assert manager.search_tasks(due_from="01.01.2024", due_to="31.01.2024") == [first, second, third]
+        manager.execute_query(f"UPDATE tasks SET due_date = '8.1.2024' WHERE id = {first}", commit=True)
+        manager.execute_query(f"PRAGMA user_version = {SCHEMA_VERSION - 1}", commit=True)
+    with TaskManager(db_name, verbose=False) as manager:  # Миграция дополняет сроки, записанные раньше
+        assert manager.execute_query(f"SELECT due_date, due_on FROM tasks WHERE id = {first}") == (
+            "08.01.2024", "2024-01-08")
+
+
+def test_category_filter_uses_index(tmp_path):
+    """Тестируем, что категории и статусы без учета регистра ищутся равенством по индексу, а не просмотром."""
+    with TaskManager(str(tmp_path / "filters.db"), verbose=False) as manager:
+        manager.bulk_add([Task(0, "Задача", "Описание", category, "01.10.2023", "Низкий", status)
+                          for category, status in (("Работа", "Выполнена"), ("РАБОТА", "выполнена"), ("Дом", ""))])
+        query_parts, params = manager._filters(category="работа", status="ВЫПОЛНЕНА")
+        assert sorted(params) == sorted(["Работа", "РАБОТА", "Выполнена", "выполнена"])
+        assert manager._filters(category="Нет такой") == (["t.category IN ()"], [])
+        plan = manager.execute_query(f"EXPLAIN QUERY PLAN SELECT t.id FROM tasks t WHERE {query_parts[0]}",
+                                     params[:2], one_line=False)
+        assert "idx_tasks_category (category=?)" in plan[0][-1]
+        assert len(manager.search_tasks(category="работа", status="выполнена")) == 2
+
+
+def test_delete_where(tmp_path):
+    """Тестируем удаление набора задач одним запросом."""
+    with TaskManager(str(tmp_path / "delete.db")) as manager:
+        manager.bulk_add(Task(0, f"Задача {i}", "Описание", ("Работа", "Дом")[i % 2], f"{i + 1:02}.10.2023",
+                              "Низкий", ("Не выполнена", "Выполнена")[i % 3 == 0]) for i in range(12))
+        assert manager.delete_where(category="дом", status="выполнена") == 2  # Задачи 3 и 9
+        assert manager.delete_where(before_date="05.10.2023") == 3  # Задачи 0, 1, 2 (задача 3 уже удалена)
+        assert manager.delete_where(category="Нет такой") == 0
+        remaining = manager.get_task()
+        assert [task.title for task in remaining] == [f"Задача {i}" for i in (4, 5, 6, 7, 8, 10, 11)]
+        assert len(manager.search_tasks(keyword="задача")) == 7  # Индекс поиска обновлен триггерами
+        with pytest.raises(ValueError):
+            manager.delete_where()
+
+
+def test_task_cache(tmp_path, task_data):
+    """Тестируем LRU-кэш задач: попадания, вытеснение и сброс при записи."""
+    with TaskManager(str(tmp_path / "cache.db"), task_cache_size=2) as manager:
+        first, second, third = (manager.add_task(task_data) for _ in range(3))
+        manager.get_task(first)
+        assert manager.get_task(first).title == "Тестовая задача"
+        assert manager.cache_info() == (1, 1, 2, 1)
+        manager.get_task([second, third])  # Вытесняет first
+        manager.get_task(first)
+        assert manager.cache_info().hits == 1
+        assert manager.update_task(first, title="Новое название").title == "Новое название"
+        assert manager.get_task(first).title == "Новое название"
+        manager.delete_task(first)
+        assert manager.get_task(first) is None
+        manager.cleanup_database()
+        assert manager.cache_info().currsize == 0
+        assert manager.get_task([second, third]) == []
+
+
+def test_task_cache_transaction(tmp_path, task_data):
+    """Тестируем, что строка, прочитанная другим потоком до коммита транзакции, не остается в кэше после него."""
+    with TaskManager(str(tmp_path / "cache.db"), task_cache_size=100, verbose=False) as manager:
+        task_id = manager.add_task(task_data)
+        deleted, read = threading.Event(), threading.Event()
+
+        def writer():
+            with manager.transaction():
+                manager.delete_task(task_id)
+                deleted.set()
+                read.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        deleted.wait(5)
+        assert manager.get_task(task_id).title == "Тестовая задача"  # Транзакция еще не зафиксирована
+        read.set()
+        thread.join()
+        assert manager.get_task(task_id) is None
+        assert manager.execute_query('SELECT count(*) FROM tasks')[0] == 0
+
+
+def test_path_db_name(tmp_path, task_data):
+    """Тестируем, что имя базы можно передать как Path."""
+    with TaskManager(tmp_path / "path.db", verbose=False) as manager:
+        task_id = manager.add_task(task_data)
+    with TaskManager(tmp_path / "path.db", read_only=True, verbose=False) as manager:
+        assert manager.get_task(task_id).title == task_data.title
+        assert manager.db_name == str(tmp_path / "path.db")
+
+
+def test_task_cache_disabled(task_manager, task_data):
+    """Тестируем, что по умолчанию кэш отключен."""
+    task_id = task_manager.add_task(task_data)
+    task_manager.get_task(task_id)
+    assert task_manager.cache_info() == (0, 0, 0, 0)
+
+
+def test_task_slots(task_data):
+    """Тестируем компактное представление задачи без __dict__."""
+    assert not hasattr(task_data, "__dict__")
+    with pytest.raises(AttributeError):
+        task_data.unknown_field = 1
+
+
+def test_transaction(tmp_path, task_data):
+    """Тестируем объединение операций в одну транзакцию и откат при ошибке."""
+    with TaskManager(str(tmp_path / "transaction.db")) as manager:
+        with manager.transaction():
+            task_id = manager.add_task(task_data)
+            with manager.transaction():  # Вложенный блок присоединяется к внешнему
+                manager.update_task(task_id, status="Выполнена")
+            assert manager.connection.in_transaction
+        assert not manager.connection.in_transaction
+        with pytest.raises(sqlite3.OperationalError):
+            with manager.transaction():
+                manager.add_task(task_data)
+                manager.execute_query("UPDATE tasks SET no_such_column = 1")
+        assert [task.status for task in manager.get_task()] == ["Выполнена"]
+
+
+def test_group_commit(tmp_path, task_data):
+    """Тестируем групповой коммит: пороги по числу операций, flush() и откат только сбойного блока."""
+    db_name = str(tmp_path / "group.db")
+    reader = sqlite3.connect(db_name)
+    count = "SELECT COUNT(*) FROM tasks"
+    with TaskManager(db_name, group_commit=True, commit_interval_ms=60_000, commit_batch=10) as manager:
+        task_ids = [manager.add_task(task_data) for _ in range(15)]
+        assert task_ids == list(range(1, 16))  # ID выдаются сразу
+        assert manager.get_task(15).title == "Тестовая задача"  # Свои записи видны до коммита
+        assert reader.execute(count).fetchone()[0] == 10  # Первые 10 операций зафиксированы одной группой
+        with pytest.raises(sqlite3.OperationalError):
+            with manager.transaction():
+                manager.add_task(task_data)
+                manager.execute_query("UPDATE tasks SET no_such_column = 1")
+        manager.flush()
+        assert reader.execute(count).fetchone()[0] == 15
+        manager.add_task(task_data)
+    assert reader.execute(count).fetchone()[0] == 16  # close() фиксирует остаток
+    reader.close()
+
+
+def test_group_commit_reads(tmp_path, task_data):
+    """Тестируем, что чтения при групповом коммите не засчитываются в порог commit_batch."""
+    db_name = str(tmp_path / "group.db")
+    reader = sqlite3.connect(db_name)
+    count = "SELECT COUNT(*) FROM tasks"
+    with TaskManager(db_name, group_commit=True, commit_interval_ms=60_000, commit_batch=5) as manager:
+        task_id = manager.add_task(task_data)
+        for _ in range(4):
+            manager.execute_query(count)
+        manager.execute_query("UPDATE tasks SET title = 'Нет такой' WHERE id = 0")  # Без изменений строк
+        assert reader.execute(count).fetchone()[0] == 0
+        for _ in range(4):
+            manager.update_task(task_id, status="Выполнена")
+        assert reader.execute(count).fetchone()[0] == 1  # Пятая запись коммитит группу
+    reader.close()
+
+
+def test_group_commit_interval(tmp_path, task_data):
+    """Тестируем фоновый коммит группы по истечении интервала и запись из нескольких потоков."""
+    db_name = str(tmp_path / "group.db")
+    with TaskManager(db_name, group_commit=True, commit_interval_ms=20, commit_batch=10_000) as manager:
+        threads = [threading.Thread(target=lambda: [manager.add_task(task_data) for _ in range(50)])
+                   for _ in range(4)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+        time.sleep(0.2)
+        with sqlite3.connect(db_name) as reader:
+            assert reader.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 200
+        reader.close()
+
+
+def test_query_stats(tmp_path, task_data):
+    """Тестируем статистику запросов: время, строки, записи триггеров и журнал медленных запросов с планом."""
+    with TaskManager(str(tmp_path / "stats.db"), stats=True, slow_query_ms=0, verbose=False) as manager:
+        task_id = manager.add_task(task_data)
+        manager.bulk_add([task_data] * 3)
+        manager.search_tasks(category="тест")
+        assert len(list(manager.iter_tasks())) == 4
+        metrics = manager.metrics()
+    assert metrics['connections_opened'] == 1
+    assert metrics['trigger_writes'] > 0  # Каждая вставка дублируется в полнотекстовый индекс
+    insert = next(stats for query, stats in metrics['statements'].items() if query.startswith('INSERT INTO tasks'))
+    assert (insert['calls'], insert['rows']) == (2, 4)
+    assert sum(insert['histogram']) == insert['calls']
+    select = next(stats for query, stats in metrics['statements'].items() if query.endswith('ORDER BY id'))
+    assert select['rows'] == 4
+    assert any('idx_tasks_category' in step for entry in metrics['slow_queries'] for step in entry['plan'])
+    assert task_id == 1 and metrics['cache']['maxsize'] == 0
+    with TaskManager(str(tmp_path / "stats.db")) as manager:
+        assert manager.stats is None and 'statements' not in manager.metrics()
+
+
+def test_search_cache(tmp_path, task_data):
+    """Тестируем кэш поиска: повтор запроса - попадание, любая запись (в том числе другим менеджером) - промах."""
+    db_name = str(tmp_path / "search.db")
+    with TaskManager(db_name, search_cache_size=2, verbose=False) as manager, \
+            TaskManager(db_name, verbose=False) as other:
+        task_id = manager.add_task(task_data)
+        assert manager.search_tasks("тестовая", category="Тест") == [task_id]
+        found = manager.search_tasks("Тестовая", category="тест")  # Те же параметры после нормализации
+        found.append(0)  # Изменение результата не портит кэш
+        assert manager.search_tasks("тестовая", category="Тест") == [task_id]
+        assert manager.search_cache_info()[:2] == (2, 1)
+        manager.update_task(task_id, category="Другое")
+        assert manager.search_tasks("тестовая", category="Тест") == []
+        second = other.add_task(task_data)
+        assert manager.search_tasks("тестовая", category="Тест") == [second]
+        other.delete_task(second)
+        assert manager.search_tasks("тестовая", category="Тест") == []
+        manager.bulk_add([task_data])
+        assert len(manager.search_tasks(category="Тест")) == 1
+        manager.search_tasks(status="выполнена")
+        info = manager.search_cache_info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (2, 6, 2, 2)
+    assert info.hit_ratio == 0.25
+    assert manager.metrics()['search_cache']['hit_ratio'] == 0.25
+
+
+def test_search_cache_foreign_write(tmp_path, task_data):
+    """Тестируем, что результат поиска, во время которого другое соединение записало задачу, не кэшируется
+    с новым поколением данных."""
+    db_name = str(tmp_path / "search.db")
+    with TaskManager(db_name, search_cache_size=2, verbose=False) as manager, \
+            TaskManager(db_name, verbose=False) as other:
+        first = manager.add_task(task_data)
+        search_rows = manager._search_rows
+
+        def search_then_write(*args, **kwargs):
+            rows = search_rows(*args, **kwargs)
+            other.add_task(task_data)  # Запись между запросом и сохранением в кэш
+            return rows
+
+        with patch.object(manager, "_search_rows", side_effect=search_then_write):
+            assert manager.search_tasks(category="Тест") == [first]
+        assert manager.search_tasks(category="Тест") == [first, first + 1]
+
+
+def test_archive(task_data):
+    """Тестируем архив: переносятся только выполненные задачи со сроком раньше даты, описание сжато,
+    архив доступен только по include_archive."""
+    with TaskManager(":memory:", verbose=False, search_cache_size=8) as manager:
+        done, late, active = (manager.add_task(task_data) for _ in range(3))
+        manager.update_task(done, status="Выполнена", description="Длинное описание " * 50)
+        manager.update_task(late, status="выполнена", due_date="2025-02-01")
+        assert manager.search_tasks("длинное") == [done]
+        assert manager.archive("01.01.2025") == 1
+        assert manager.get_task(done) is None and manager.search_tasks("длинное") == []
+        archived = manager.get_task(done, include_archive=True)
+        assert (archived.status, archived.description) == ("Выполнена", "Длинное описание " * 50)
+        stored = manager.execute_query('SELECT length(description) FROM tasks_archive WHERE id = ?', (done,))[0]
+        assert stored < len(archived.description.encode('utf-8'))
+        assert manager.search_tasks("длинное", include_archive=True) == [done]
+        assert manager.search_tasks(category="тест", include_archive=True, limit=2) == [done, late]
+        assert manager.search_tasks(status="выполнена", include_archive=True, order_by='due_date') == [done, late]
+        assert [task.task_id for task in manager.get_task([active, done], include_archive=True)] == [active, done]
+        assert [task.task_id for task in manager.iter_tasks(include_archive=True, offset=1)] == [late, active]
+        assert manager.summary()['status'] == {'Не выполнена': 1, 'выполнена': 1}
+        assert manager.archive("01.01.2026") == 1
+        manager.cleanup_database()
+        assert manager.get_task(include_archive=True) == []
+        assert manager.search_tasks("длинное", include_archive=True) == []
+
+
+def test_busy_retry(tmp_path, task_data):
+    """Тестируем повтор записи с задержкой, пока базу держит другое соединение (как другой процесс)."""
+    db_name = str(tmp_path / "busy.db")
+    writer = TaskManager(db_name, verbose=False)
+    impatient = TaskManager(db_name, busy_timeout_ms=10, busy_retries=0, verbose=False)
+    patient = TaskManager(db_name, busy_timeout_ms=10, busy_retries=8, busy_backoff_ms=20, verbose=False)
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with writer.transaction():
+            writer.add_task(task_data)
+            locked.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    locked.wait()
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        impatient.add_task(task_data)
+    threading.Timer(0.1, release.set).start()
+    assert patient.add_task(task_data) == 2  # Дождался коммита первой задачи
+    thread.join()
+    for manager in (writer, impatient, patient):
+        manager.close()
+
+
+def test_read_only(tmp_path, task_data):
+    """Тестируем менеджер только для чтения: читает не дожидаясь писателя и не может изменить базу."""
+    db_name = str(tmp_path / "replica.db")
+    with TaskManager(db_name, verbose=False) as writer, TaskManager(db_name, read_only=True) as reader:
+        task_id = writer.add_task(task_data)
+        with writer.transaction():  # Незафиксированная запись не мешает читателю и не видна ему
+            writer.add_task(task_data)
+            assert [task.task_id for task in reader.get_task()] == [task_id]
+        assert len(reader.search_tasks("тестовая")) == 2
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            reader.add_task(task_data)
+    with pytest.raises(sqlite3.DatabaseError, match="read_only"):
+        sqlite3.connect(tmp_path / "old.db").close()
+        TaskManager(str(tmp_path / "old.db"), read_only=True).get_task(1)
+
+
+def test_changes_since(tmp_path, task_data):
+    """Тестируем журнал изменений: порядок, состояние задачи после изменения и получение только новых записей."""
+    with TaskManager(str(tmp_path / "changes.db"), verbose=False) as manager:
+        task_id = manager.add_task(task_data)
+        manager.bulk_add([task_data] * 2)
+        seq = manager.last_change_seq()
+        manager.update_task(task_id, status="Выполнена")
+        manager.delete_task(task_id + 1)
+        changes = list(manager.changes_since(seq))
+        assert [(change.operation, change.task_id) for change in changes] == [("update", task_id),
+                                                                              ("delete", task_id + 1)]
+        assert changes[0].task.status == "Выполнена" and changes[1].task is None
+        assert [change.seq for change in manager.changes_since()] == list(range(1, seq + 3))
+        assert len(list(manager.changes_since(limit=2))) == 2
+        assert manager.prune_changes(seq) == seq
+        assert [change.seq for change in manager.changes_since()] == [seq + 1, seq + 2]
+
+
+def test_changes_backfill(tmp_path):
+    """Тестируем, что задачи, добавленные до появления журнала, попадают в него как добавленные."""
+    db_name = str(tmp_path / "old.db")
+    with sqlite3.connect(db_name) as connection:
+        connection.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                           "description TEXT NOT NULL, category TEXT NOT NULL, due_date TEXT NOT NULL, "
+                           "priority TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'Не выполнена')")
+        connection.execute("INSERT INTO tasks (title, description, category, due_date, priority) "
+                           "VALUES ('Старая', 'Задача', 'Дом', '01.02.2023', 'Низкий')")
+    connection.close()
+    with TaskManager(db_name, verbose=False) as manager:
+        [change] = manager.changes_since()
+    assert (change.operation, change.task) == ("insert", Task(1, "Старая", "Задача", "Дом", "01.02.2023", "Низкий"))
+    assert (change.due_on, change.priority_rank) == ("2023-02-01", 1)
+
+
+def test_summary(tmp_path, task_data):
+    """Тестируем сводную таблицу: она совпадает с подсчетом по задачам после любых изменений и откатов."""
+    with TaskManager(str(tmp_path / "summary.db"), verbose=False) as manager:
+        def counted():
+            return {dimension: dict(manager.execute_query(
+                f'SELECT {dimension}, COUNT(*) FROM tasks GROUP BY {dimension} ORDER BY {dimension}', one_line=False))
+                for dimension in ('category', 'status', 'priority')}
+
+        first = manager.add_task(task_data)
+        manager.bulk_add([Task(0, "Дом", "Уборка", "Дом", "01.02.2024", "Низкий")] * 3)
+        manager.update_task(first, category="Дом", status="Выполнена")
+        manager.update_task(first + 1, title="Только название")
+        manager.delete_task(first + 2)
+        with pytest.raises(RuntimeError), manager.transaction():
+            manager.delete_where(category="дом")
+            raise RuntimeError("откат")
+        assert manager.summary() == counted() == {'category': {'Дом': 3},
+                                                   'status': {'Выполнена': 1, 'Не выполнена': 2},
+                                                   'priority': {'Высокий': 1, 'Низкий': 2}}
+        assert manager.categories() == ['Дом']
+        manager.delete_where(status="выполнена")
+        assert manager.summary() == counted()
+        manager.cleanup_database()
+        assert manager.summary() == {'category': {}, 'status': {}, 'priority': {}}
+
+
+def test_memory_snapshot_restore(tmp_path, task_data):
+    """Тестируем базу в памяти: снимок в файл, восстановление и контрольные точки при закрытии."""
+    snapshot = tmp_path / "snapshot.db"
+    with TaskManager(":memory:", verbose=False) as first, TaskManager(":memory:", verbose=False) as second:
+        task_id = first.add_task(task_data)
+        assert second.get_task() == []  # У каждого менеджера своя база в памяти
+        first.snapshot(snapshot)
+        first.cleanup_database()
+        first.restore(snapshot)
+        assert first.get_task(task_id) == Task(task_id, *astuple(task_data)[1:])
+        second.restore(snapshot)
+        assert second.summary()['category'] == {"Тест": 1}
+        with pytest.raises(RuntimeError), second.transaction():
+            second.snapshot(snapshot)
+    with pytest.raises(FileNotFoundError):
+        TaskManager(":memory:").restore(tmp_path / "missing.db")
+    file_db = tmp_path / "file.db"
+    with TaskManager(str(file_db), verbose=False) as manager:  # Обычная база в режиме WAL
+        manager.bulk_add([task_data] * 3)
+    checkpoint = tmp_path / "checkpoint.db"
+    with TaskManager(":memory:", checkpoint_path=str(checkpoint), verbose=False) as manager:
+        manager.restore(file_db)
+        manager.delete_task(1)
+    with TaskManager(":memory:", checkpoint_path=str(checkpoint), verbose=False) as manager:
+        assert [task.task_id for task in manager.get_task()] == [2, 3]
+
+
+def test_memory_checkpoint_thread(tmp_path, task_data):
+    """Тестируем периодические контрольные точки базы в памяти в фоновом потоке."""
+    checkpoint = tmp_path / "checkpoint.db"
+    manager = TaskManager(":memory:", checkpoint_path=str(checkpoint), checkpoint_interval_s=0.02, verbose=False)
+    manager.add_task(task_data)
+    deadline = time.monotonic() + 5
+    while not checkpoint.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.close()
+    with TaskManager(str(checkpoint), verbose=False) as copy:
+        assert len(copy.get_task()) == 1
+    with TaskManager(":memory:", checkpoint_path=str(checkpoint), verbose=False) as manager:
+        assert len(manager.get_task()) == 1
+        assert not manager.checkpoint()  # После восстановления изменений не было